@@ -1,36 +1,112 @@
-from typing import Dict, List, Any
+from typing import Dict, DefaultDict, List, Any, Tuple
+from collections import defaultdict
+import asyncio
 import os
 import re
+import sys
 
 from models.analysis import DesignPattern
 from services.llm_service import LLMService
+from core.content_cache import ContentCache, content_digest
+
+# Regexes used by the heuristic detectors, compiled once at import
+_RE_PY_CREATE = re.compile(r'def create_\w+\(')
+_RE_JS_CREATE_FUNCTION = re.compile(r'function create\w+\(')
+_RE_JS_CREATE_ASSIGN = re.compile(r'create\w+\s*=\s*function')
+_RE_PY_OBSERVER = re.compile(r'def (notify|update|on_\w+)\(')
+
+# Observer method markers for substring checks. 'unsubscribe' is covered by
+# 'subscribe'; the most common hit, 'on(', goes first to end the scan early.
+_OBSERVER_METHODS = ('on(', 'subscribe', 'notify', 'addListener', 'removeListener', 'addEventListener')
+
+# Canonical (interned) names for common patterns, so names coming back from the
+# LLM share the string objects used by the heuristics when grouped for dedup
+_KNOWN_PATTERN_NAMES = {
+    name: sys.intern(name) for name in (
+        "Singleton", "Factory", "Observer", "Strategy", "Decorator", "Adapter",
+        "Builder", "Proxy", "Facade", "Command", "Repository", "MVC"
+    )
+}
+
+# Filename keywords that make a file a priority candidate for LLM pattern detection
+_PRIORITY_KEYWORDS = ('factory', 'builder', 'adapter', 'decorator', 'strategy', 'proxy', 'service')
+
+# Integer codes for the extensions the detectors branch on, resolved once per file
+_EXT_OTHER, _EXT_PY, _EXT_JS, _EXT_TS, _EXT_JSX, _EXT_TSX, _EXT_JAVA, _EXT_CS = range(8)
+_EXT_CODES = {
+    '.py': _EXT_PY,
+    '.js': _EXT_JS,
+    '.ts': _EXT_TS,
+    '.jsx': _EXT_JSX,
+    '.tsx': _EXT_TSX,
+    '.java': _EXT_JAVA,
+    '.cs': _EXT_CS,
+}
+_JS_TS = frozenset((_EXT_JS, _EXT_TS))
+_JS_TS_REACT = frozenset((_EXT_JS, _EXT_TS, _EXT_JSX, _EXT_TSX))
+_JAVA_CS = frozenset((_EXT_JAVA, _EXT_CS))
+
+# Only source files are scanned; docs, data files and oversized (usually generated
+# or minified) files are skipped before any hashing or scanning
+_SOURCE_EXTENSIONS = frozenset((
+    '.py', '.js', '.ts', '.jsx', '.tsx', '.java', '.cs', '.c', '.cpp', '.h',
+    '.go', '.rb', '.php', '.swift', '.kt', '.rs', '.scala'
+))
+_MAX_SCAN_CHARS = 1_000_000
+
+# Heuristic results keyed by (lowercased filename, content digest), so
+# duplicated files and repeat analyses of unchanged files skip the scan
+_scan_cache = ContentCache(max_size=4096)
 
 async def identify_patterns(files_content: Dict[str, str], llm_service: LLMService) -> List[DesignPattern]:
     """Identify design patterns in the codebase using both heuristics and LLM"""
-    patterns = []
-    
-    # Use heuristic detection first
-    heuristic_patterns = await heuristic_pattern_detection(files_content)
-    patterns.extend(heuristic_patterns)
-    
-    # Use LLM for more sophisticated pattern detection
-    llm_patterns = await llm_pattern_detection(files_content, llm_service)
+    # Overlap heuristic detection with the LLM round-trip, which dominates. The LLM
+    # task is started first so its request is in flight while the heuristics run.
+    llm_patterns, heuristic_patterns = await asyncio.gather(
+        llm_pattern_detection(files_content, llm_service),
+        heuristic_pattern_detection(files_content)
+    )
     
     # Merge and deduplicate patterns
-    all_patterns = patterns + llm_patterns
-    deduplicated_patterns = await deduplicate_patterns(all_patterns)
+    all_patterns = heuristic_patterns + llm_patterns
+    deduplicated_patterns = deduplicate_patterns(all_patterns)
     
     return deduplicated_patterns
 
 async def heuristic_pattern_detection(files_content: Dict[str, str]) -> List[DesignPattern]:
     """Use heuristics to detect common design patterns"""
     patterns = []
-    
-    # Check for singleton pattern
     singleton_files = []
+    factory_files = []
+    observer_files = []
+    
+    # Serve what we can from the cache and scan the rest. The scan runs about as fast
+    # as the contents could be pickled to a worker process, so it stays inline.
+    flags_by_path = {}
     for file_path, content in files_content.items():
-        if await detect_singleton(file_path, content):
+        filename = os.path.basename(file_path).lower()
+        if os.path.splitext(filename)[1] not in _SOURCE_EXTENSIONS or len(content) > _MAX_SCAN_CHARS:
+            continue
+        
+        cache_key = (filename, content_digest(content))
+        flags = _scan_cache.get(cache_key)
+        if flags is None:
+            flags = _scan_file(filename, content)
+            _scan_cache.set(cache_key, flags)
+        flags_by_path[file_path] = flags
+    
+    for file_path in files_content:
+        flags = flags_by_path.get(file_path)
+        if flags is None:
+            continue
+        
+        is_singleton, is_factory, is_observer = flags
+        if is_singleton:
             singleton_files.append(file_path)
+        if is_factory:
+            factory_files.append(file_path)
+        if is_observer:
+            observer_files.append(file_path)
     
     if singleton_files:
         patterns.append(DesignPattern(
@@ -40,12 +116,6 @@ async def heuristic_pattern_detection(files_content: Dict[str, str]) -> List[Des
             description="The Singleton pattern ensures a class has only one instance and provides a global point of access to it."
         ))
     
-    # Check for factory pattern
-    factory_files = []
-    for file_path, content in files_content.items():
-        if await detect_factory(file_path, content):
-            factory_files.append(file_path)
-    
     if factory_files:
         patterns.append(DesignPattern(
             name="Factory",
@@ -54,12 +124,6 @@ async def heuristic_pattern_detection(files_content: Dict[str, str]) -> List[Des
             description="The Factory pattern provides an interface for creating objects without specifying their concrete classes."
         ))
     
-    # Check for observer pattern
-    observer_files = []
-    for file_path, content in files_content.items():
-        if await detect_observer(file_path, content):
-            observer_files.append(file_path)
-    
     if observer_files:
         patterns.append(DesignPattern(
             name="Observer",
@@ -70,80 +134,78 @@ async def heuristic_pattern_detection(files_content: Dict[str, str]) -> List[Des
     
     return patterns
 
-async def detect_singleton(file_path: str, content: str) -> bool:
+def _scan_file(filename: str, content: str) -> Tuple[bool, bool, bool]:
+    """Check a single file for the singleton, factory and observer patterns"""
+    ext_code = _EXT_CODES.get(os.path.splitext(filename)[1], _EXT_OTHER)
+    
+    return (
+        detect_singleton(content, ext_code),
+        detect_factory(content, ext_code, filename),
+        detect_observer(content, ext_code, filename)
+    )
+
+def detect_singleton(content: str, ext_code: int) -> bool:
     """Detect singleton pattern"""
-    ext = os.path.splitext(file_path)[1].lower()
+    # Each check returns as soon as the outcome is known, testing the rarest marker first
     
-    # Python singleton detection
-    if ext == '.py':
-        has_instance_var = '_instance' in content or '__instance' in content
-        has_get_instance = 'get_instance' in content or 'getInstance' in content
-        return has_instance_var and has_get_instance
+    # Python singleton detection ('_instance' also covers '__instance')
+    if ext_code == _EXT_PY:
+        return '_instance' in content and ('get_instance' in content or 'getInstance' in content)
     
     # JavaScript/TypeScript singleton detection
-    elif ext in ['.js', '.ts', '.jsx', '.tsx']:
-        has_instance_var = 'this.instance' in content or 'this._instance' in content
-        has_module_exports = 'module.exports' in content
-        has_get_instance = 'getInstance' in content
-        return (has_instance_var and has_get_instance) or (has_module_exports and 'new ' not in content)
+    elif ext_code in _JS_TS_REACT:
+        if 'getInstance' in content and ('this.instance' in content or 'this._instance' in content):
+            return True
+        return 'module.exports' in content and 'new ' not in content
     
     # Java/C# singleton detection
-    elif ext in ['.java', '.cs']:
-        has_private_constructor = 'private ' in content and ' new ' in content
-        has_static_instance = 'static ' in content and 'getInstance' in content
-        return has_private_constructor and has_static_instance
+    elif ext_code in _JAVA_CS:
+        return 'getInstance' in content and 'static ' in content and ' new ' in content and 'private ' in content
     
     return False
 
-async def detect_factory(file_path: str, content: str) -> bool:
+def detect_factory(content: str, ext_code: int, filename: str) -> bool:
     """Detect factory pattern"""
-    ext = os.path.splitext(file_path)[1].lower()
-    filename = os.path.basename(file_path).lower()
-    
     # Check filename
     if 'factory' in filename:
         return True
     
-    # Check content
-    if 'create' in content and ('return new' in content or 'return ' in content):
+    # Check content ('return ' also covers 'return new')
+    has_create = 'create' in content
+    if has_create and 'return ' in content:
         return True
     
-    # Language-specific checks
-    if ext == '.py':
-        if re.search(r'def create_\w+\(', content):
+    # Language-specific checks (every create regex needs the 'create' literal,
+    # so files without it skip the regex engine entirely)
+    if ext_code == _EXT_PY:
+        if has_create and _RE_PY_CREATE.search(content):
             return True
-    elif ext in ['.js', '.ts']:
-        if re.search(r'function create\w+\(', content) or re.search(r'create\w+\s*=\s*function', content):
+    elif ext_code in _JS_TS:
+        if has_create and (_RE_JS_CREATE_FUNCTION.search(content) or _RE_JS_CREATE_ASSIGN.search(content)):
             return True
-    elif ext in ['.java', '.cs']:
+    elif ext_code in _JAVA_CS:
         if 'abstract' in content and 'new' in content and ('protected' in content or 'public' in content):
             return True
     
     return False
 
-async def detect_observer(file_path: str, content: str) -> bool:
+def detect_observer(content: str, ext_code: int, filename: str) -> bool:
     """Detect observer pattern"""
-    ext = os.path.splitext(file_path)[1].lower()
-    filename = os.path.basename(file_path).lower()
-    
     # Check filename
     if 'observer' in filename or 'listener' in filename or 'event' in filename:
         return True
     
-    # Check content for observer-related methods
-    observer_methods = ['subscribe', 'unsubscribe', 'notify', 'addListener', 'removeListener', 'addEventListener', 'on(']
-    if any(method in content for method in observer_methods):
+    # Check content for observer-related methods. This also settles the JS/TS
+    # event emitter case: emit() alone is not enough without 'on(' or
+    # 'addEventListener', and either of those has already matched here.
+    if any(method in content for method in _OBSERVER_METHODS):
         return True
     
     # Language-specific checks
-    if ext == '.py':
-        if re.search(r'def (notify|update|on_\w+)\(', content):
+    if ext_code == _EXT_PY:
+        if _RE_PY_OBSERVER.search(content):
             return True
-    elif ext in ['.js', '.ts']:
-        # Check for event emitter pattern
-        if 'emit(' in content and ('on(' in content or 'addEventListener' in content):
-            return True
-    elif ext in ['.java']:
+    elif ext_code == _EXT_JAVA:
         # Check for standard Java observer interfaces
         if 'implements Observer' in content or 'extends Observable' in content:
             return True
@@ -153,28 +215,24 @@ async def detect_observer(file_path: str, content: str) -> bool:
 async def llm_pattern_detection(files_content: Dict[str, str], llm_service: LLMService) -> List[DesignPattern]:
     """Use LLM to detect more complex design patterns"""
     # Select a subset of files to analyze (to avoid overwhelming the LLM)
-    selected_files = {}
-    file_count = 0
     max_files = 10  # Adjust based on token limits
     
-    # Prioritize files that are most likely to contain design patterns
-    priority_files = [
-        path for path in files_content.keys() 
-        if any(keyword in os.path.basename(path).lower() for keyword in 
-              ['factory', 'builder', 'adapter', 'decorator', 'strategy', 'proxy', 'service'])
-    ]
-    
-    # Add priority files first
-    for path in priority_files:
-        if file_count < max_files:
-            selected_files[path] = files_content[path]
-            file_count += 1
-    
-    # Add other files until we reach the limit
-    for path, content in files_content.items():
-        if path not in selected_files and file_count < max_files:
-            selected_files[path] = content
-            file_count += 1
+    # Prioritize files that are most likely to contain design patterns, collecting
+    # other files as fallbacks in the same pass
+    priority_files = []
+    other_files = []
+    for path in files_content:
+        basename = os.path.basename(path).lower()
+        if any(keyword in basename for keyword in _PRIORITY_KEYWORDS):
+            priority_files.append(path)
+            if len(priority_files) == max_files:
+                break
+        elif len(other_files) < max_files:
+            other_files.append(path)
+    
+    # Add priority files first, then other files until we reach the limit
+    selected_paths = priority_files + other_files[:max_files - len(priority_files)]
+    selected_files = {path: files_content[path] for path in selected_paths}
             
     # If we have no files, return empty list
     if not selected_files:
@@ -185,13 +243,18 @@ async def llm_pattern_detection(files_content: Dict[str, str], llm_service: LLMS
     
     # Convert results to DesignPattern objects
     patterns = []
+    known_files = files_content.keys()
     for result in llm_results:
         if isinstance(result, dict) and 'name' in result and 'files' in result:
-            # Ensure files exist in our codebase
-            valid_files = [f for f in result.get('files', []) if f in files_content]
+            # Ensure files exist in our codebase (and tolerate malformed 'files' values)
+            files_list = result['files']
+            if not isinstance(files_list, list):
+                continue
+            valid_files = [f for f in files_list if isinstance(f, str) and f in known_files]
             if valid_files:
+                name = result['name']
                 patterns.append(DesignPattern(
-                    name=result.get('name', 'Unknown Pattern'),
+                    name=_KNOWN_PATTERN_NAMES.get(name, name) if isinstance(name, str) else name,
                     files=valid_files,
                     confidence=float(result.get('confidence', 0.5)),
                     description=result.get('description', 'No description provided')
@@ -199,41 +262,45 @@ async def llm_pattern_detection(files_content: Dict[str, str], llm_service: LLMS
     
     return patterns
 
-async def deduplicate_patterns(patterns: List[DesignPattern]) -> List[DesignPattern]:
+def _new_merge_entry() -> Dict[str, Any]:
+    """Accumulator for all patterns sharing one name in deduplicate_patterns"""
+    return {
+        "first": None,
+        "count": 0,
+        "files": {},  # Insertion-ordered set of file paths
+        "confidence": 0.0,
+        "description": ""
+    }
+
+def deduplicate_patterns(patterns: List[DesignPattern]) -> List[DesignPattern]:
     """Deduplicate patterns based on name and files"""
     if not patterns:
         return []
     
-    # Group by pattern name
-    pattern_groups = {}
+    # Merge patterns with the same name in a single pass, keeping first-seen order
+    merged: DefaultDict[str, Dict[str, Any]] = defaultdict(_new_merge_entry)
     for pattern in patterns:
-        if pattern.name not in pattern_groups:
-            pattern_groups[pattern.name] = []
-        pattern_groups[pattern.name].append(pattern)
+        entry = merged[pattern.name]
+        entry["count"] += 1
+        if entry["first"] is None:
+            entry["first"] = pattern
+        entry["files"].update(dict.fromkeys(pattern.files))
+        if pattern.confidence > entry["confidence"]:
+            entry["confidence"] = pattern.confidence
+        # Keep the longest description (the first one seen on ties)
+        if pattern.description and len(pattern.description) > len(entry["description"]):
+            entry["description"] = pattern.description
     
-    # Merge patterns with the same name
     result = []
-    for name, group in pattern_groups.items():
-        if len(group) == 1:
-            result.append(group[0])
+    for name, entry in merged.items():
+        if entry["count"] == 1:
+            result.append(entry["first"])
         else:
-            # Merge files and take the highest confidence
-            all_files = set()
-            max_confidence = 0.0
-            descriptions = []
-            
-            for pattern in group:
-                all_files.update(pattern.files)
-                max_confidence = max(max_confidence, pattern.confidence)
-                if pattern.description and pattern.description not in descriptions:
-                    descriptions.append(pattern.description)
-            
-            # Create a merged pattern
             result.append(DesignPattern(
                 name=name,
-                files=list(all_files),
-                confidence=max_confidence,
-                description=max(descriptions, key=len) if descriptions else "No description provided"
+                files=list(entry["files"]),
+                confidence=entry["confidence"],
+                description=entry["description"] or "No description provided"
             ))
     
     return result
\ No newline at end of file
@@ -1,249 +1,157 @@
+import json
 import logging
-from typing import Dict, List, Any
+import re
+from collections import defaultdict, namedtuple
+from typing import Dict, List, Any, Optional, Tuple
+from config.settings import settings
 from services.llm_service import llm_service
+from core.content_cache import ContentCache, DiskCache, content_digest
+from core.executors import run_in_thread
 
 logger = logging.getLogger(__name__)
 
-class RefactoringAdvisor:
-    """Agent responsible for suggesting refactoring techniques based on code analysis"""
-    
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        
-        # Define refactoring techniques mapped to code smells
-        self.refactoring_techniques = {
-            "long_method": [
-                {
-                    "technique": "Extract Method",
-                    "description": "Split the method into smaller, focused methods.",
-                    "example": "Extract logical blocks of code into well-named methods that explain their purpose."
-                },
-                {
-                    "technique": "Replace Method with Method Object",
-                    "description": "Convert the method into its own class with fields for method parameters and local variables.",
-                    "example": "Create a new class named after the method. Pass all local variables as constructor parameters."
-                },
-                {
-                    "technique": "Decompose Conditional",
-                    "description": "Extract complex conditional logic into separate methods.",
-                    "example": "Replace 'if (complex condition)' with 'if (isValidForOperation())' and implement the condition logic in a separate method."
-                }
-            ],
-            "large_class": [
-                {
-                    "technique": "Extract Class",
-                    "description": "Create new classes to handle distinct responsibilities.",
-                    "example": "Identify related methods and fields and move them to a new class with a clear responsibility."
-                },
-                {
-                    "technique": "Extract Interface",
-                    "description": "Extract common functionality into interfaces.",
-                    "example": "Identify groups of related public methods and extract them into well-defined interfaces."
-                },
-                {
-                    "technique": "Move Method",
-                    "description": "Move methods to classes where they are more logically placed.",
-                    "example": "If a method uses more features of another class than its own, consider moving it to that class."
-                }
-            ],
-            "long_parameter_list": [
-                {
-                    "technique": "Introduce Parameter Object",
-                    "description": "Replace multiple parameters with a single object.",
-                    "example": "Replace method(name, age, address, phone) with method(personDetails) where personDetails is an object."
-                },
-                {
-                    "technique": "Preserve Whole Object",
-                    "description": "Pass the whole object instead of multiple attributes.",
-                    "example": "Instead of method(customer.getName(), customer.getAddress()), use method(customer)."
-                },
-                {
-                    "technique": "Replace Parameter with Method Call",
-                    "description": "If a parameter value can be obtained by a method call, use that instead.",
-                    "example": "Replace method(customer, customer.getPlan()) with method(customer) and call getPlan() inside."
-                }
-            ],
-            "duplicate_code": [
-                {
-                    "technique": "Extract Method",
-                    "description": "Extract the duplicated code into a shared method.",
-                    "example": "Identify common code blocks and extract them into well-named methods."
-                },
-                {
-                    "technique": "Pull Up Method",
-                    "description": "If duplicate code is in subclasses, move it to the superclass.",
-                    "example": "When similar methods exist in sibling classes, move them to their parent class."
-                },
-                {
-                    "technique": "Form Template Method",
-                    "description": "Define a template method in the superclass that calls abstract methods implemented in subclasses.",
-                    "example": "Create a template method in the parent class that defines the algorithm structure, with abstract methods for variant steps."
-                }
-            ],
-            "complex_conditional": [
-                {
-                    "technique": "Decompose Conditional",
-                    "description": "Extract complex conditions into well-named methods.",
-                    "example": "Replace 'if (date.before(SUMMER_START) || date.after(SUMMER_END))' with 'if (isWinter(date))'."
-                },
-                {
-                    "technique": "Replace Conditional with Polymorphism",
-                    "description": "Create polymorphic objects to handle different cases.",
-                    "example": "Replace 'if (type == ENGINEER) { ... } else if (type == MANAGER) { ... }' with specialized classes."
-                },
-                {
-                    "technique": "Replace Nested Conditional with Guard Clauses",
-                    "description": "Use guard clauses to handle special cases early.",
-                    "example": "Convert nested if-else blocks to 'if (special case) return/throw; // normal execution'."
-                }
-            ],
-            "dead_code": [
-                {
-                    "technique": "Remove Dead Code",
-                    "description": "Simply delete unreachable or never-executed code.",
-                    "example": "Delete commented-out code blocks, unreachable code, and unused methods."
-                },
-                {
-                    "technique": "Inline Method",
-                    "description": "If a method is only used once, consider inlining it.",
-                    "example": "Replace 'result = calculateTemp(); return result;' with 'return calculateTemp();'."
-                }
-            ],
-            "comment_overuse": [
-                {
-                    "technique": "Rename Method",
-                    "description": "Rename methods and variables to better reflect their purpose, reducing the need for comments.",
-                    "example": "Replace 'getD()' with 'getDiscount()' and remove the comment explaining it's for discounts."
-                },
-                {
-                    "technique": "Extract Method",
-                    "description": "Extract complex logic into well-named methods that serve as self-documentation.",
-                    "example": "Replace a complex algorithm with a call to a descriptively named method."
-                },
-                {
-                    "technique": "Introduce Assertion",
-                    "description": "Replace comments about assumptions with assertions.",
-                    "example": "Replace '// x must be positive' with 'assert x > 0'."
-                }
-            ]
-        }
+Technique = namedtuple("Technique", "technique description example")
 
-    async def suggest_refactorings(self, file_path: str, file_content: str, analysis_results: Dict) -> Dict:
-        """Suggest refactoring techniques based on analysis results"""
-        try:
-            # Extract code smells from analysis results
-            code_smells = analysis_results.get("data", {}).get("analysis", {}).get("code_smells", [])
-            
-            # Generate refactoring suggestions
-            refactoring_suggestions = self._generate_refactoring_suggestions(code_smells)
-            
-            # Enhance suggestions with LLM insights
-            enhanced_suggestions = await self._enhance_suggestions_with_llm(file_path, file_content, code_smells, refactoring_suggestions)
-            
-            return {
-                "status": "success",
-                "file_path": file_path,
-                "refactoring_suggestions": enhanced_suggestions
-            }
-            
-        except Exception as e:
-            self.logger.exception(f"Error generating refactoring suggestions for {file_path}: {str(e)}")
-            return {
-                "status": "error",
-                "message": f"Error generating refactoring suggestions: {str(e)}",
-                "file_path": file_path
-            }
-    
-    def _generate_refactoring_suggestions(self, code_smells: List[Dict]) -> List[Dict]:
-        """Generate initial refactoring suggestions based on detected code smells"""
-        suggestions = []
-        
-        for smell in code_smells:
-            smell_type = smell.get("type")
-            
-            # Get appropriate refactoring techniques for this smell type
-            if smell_type in self.refactoring_techniques:
-                techniques = self.refactoring_techniques[smell_type]
-                
-                for technique in techniques:
-                    suggestion = {
-                        "smell_type": smell_type,
-                        "smell_description": smell.get("description", ""),
-                        "affected_area": smell.get("lines", ""),
-                        "technique": technique["technique"],
-                        "description": technique["description"],
-                        "example": technique["example"],
-                        "severity": smell.get("severity", "medium")
-                    }
-                    suggestions.append(suggestion)
-            else:
-                # For unknown smell types, add a generic suggestion
-                suggestions.append({
-                    "smell_type": smell_type,
-                    "smell_description": smell.get("description", ""),
-                    "affected_area": smell.get("lines", ""),
-                    "technique": "Refactor based on best practices",
-                    "description": "Consider refactoring this code using standard techniques.",
-                    "example": "Review the code for clarity, simplicity, and maintainability.",
-                    "severity": smell.get("severity", "medium")
-                })
-        
-        return suggestions
-    
-    async def _enhance_suggestions_with_llm(self, file_path: str, file_content: str, code_smells: List[Dict], initial_suggestions: List[Dict]) -> List[Dict]:
-        """Enhance refactoring suggestions using LLM for more context-aware advice"""
-        try:
-            # Skip LLM enhancement if there are no code smells or suggestions
-            if not code_smells or not initial_suggestions:
-                return initial_suggestions
-            
-            # Prepare the prompt for the LLM
-            prompt = self._create_enhancement_prompt(file_path, file_content, code_smells, initial_suggestions)
-            
-            # Call the LLM service
-            llm_response = await llm_service._call_llm(prompt)
-            
-            # Process the LLM response
-            enhanced_suggestions = self._process_llm_enhancement_response(llm_response, initial_suggestions)
-            
-            return enhanced_suggestions
-            
-        except Exception as e:
-            self.logger.exception(f"Error enhancing suggestions with LLM for {file_path}: {str(e)}")
-            # Return initial suggestions if LLM enhancement fails
-            return initial_suggestions
-    
-    def _create_enhancement_prompt(self, file_path: str, file_content: str, code_smells: List[Dict], initial_suggestions: List[Dict]) -> str:
-        """Create a prompt for the LLM to enhance refactoring suggestions"""
-        # Convert initial suggestions to a string representation
-        suggestions_str = "\n".join([
-            f"- {s['technique']} for {s['smell_type']} at {s['affected_area']}: {s['description']}"
-            for s in initial_suggestions
-        ])
-        
-        # Create a list of code smells for the prompt
-        smells_str = "\n".join([
-            f"- {smell.get('type')}: {smell.get('description')} at {smell.get('lines')} (Severity: {smell.get('severity', 'medium')})"
-            for smell in code_smells
-        ])
-        
-        return f"""
+# Refactoring techniques mapped to code smells
+_REFACTORING_TECHNIQUES = {
+    "long_method": (
+        Technique(
+            technique="Extract Method",
+            description="Split the method into smaller, focused methods.",
+            example="Extract logical blocks of code into well-named methods that explain their purpose."
+        ),
+        Technique(
+            technique="Replace Method with Method Object",
+            description="Convert the method into its own class with fields for method parameters and local variables.",
+            example="Create a new class named after the method. Pass all local variables as constructor parameters."
+        ),
+        Technique(
+            technique="Decompose Conditional",
+            description="Extract complex conditional logic into separate methods.",
+            example="Replace 'if (complex condition)' with 'if (isValidForOperation())' and implement the condition logic in a separate method."
+        )
+    ),
+    "large_class": (
+        Technique(
+            technique="Extract Class",
+            description="Create new classes to handle distinct responsibilities.",
+            example="Identify related methods and fields and move them to a new class with a clear responsibility."
+        ),
+        Technique(
+            technique="Extract Interface",
+            description="Extract common functionality into interfaces.",
+            example="Identify groups of related public methods and extract them into well-defined interfaces."
+        ),
+        Technique(
+            technique="Move Method",
+            description="Move methods to classes where they are more logically placed.",
+            example="If a method uses more features of another class than its own, consider moving it to that class."
+        )
+    ),
+    "long_parameter_list": (
+        Technique(
+            technique="Introduce Parameter Object",
+            description="Replace multiple parameters with a single object.",
+            example="Replace method(name, age, address, phone) with method(personDetails) where personDetails is an object."
+        ),
+        Technique(
+            technique="Preserve Whole Object",
+            description="Pass the whole object instead of multiple attributes.",
+            example="Instead of method(customer.getName(), customer.getAddress()), use method(customer)."
+        ),
+        Technique(
+            technique="Replace Parameter with Method Call",
+            description="If a parameter value can be obtained by a method call, use that instead.",
+            example="Replace method(customer, customer.getPlan()) with method(customer) and call getPlan() inside."
+        )
+    ),
+    "duplicate_code": (
+        Technique(
+            technique="Extract Method",
+            description="Extract the duplicated code into a shared method.",
+            example="Identify common code blocks and extract them into well-named methods."
+        ),
+        Technique(
+            technique="Pull Up Method",
+            description="If duplicate code is in subclasses, move it to the superclass.",
+            example="When similar methods exist in sibling classes, move them to their parent class."
+        ),
+        Technique(
+            technique="Form Template Method",
+            description="Define a template method in the superclass that calls abstract methods implemented in subclasses.",
+            example="Create a template method in the parent class that defines the algorithm structure, with abstract methods for variant steps."
+        )
+    ),
+    "complex_conditional": (
+        Technique(
+            technique="Decompose Conditional",
+            description="Extract complex conditions into well-named methods.",
+            example="Replace 'if (date.before(SUMMER_START) || date.after(SUMMER_END))' with 'if (isWinter(date))'."
+        ),
+        Technique(
+            technique="Replace Conditional with Polymorphism",
+            description="Create polymorphic objects to handle different cases.",
+            example="Replace 'if (type == ENGINEER) { ... } else if (type == MANAGER) { ... }' with specialized classes."
+        ),
+        Technique(
+            technique="Replace Nested Conditional with Guard Clauses",
+            description="Use guard clauses to handle special cases early.",
+            example="Convert nested if-else blocks to 'if (special case) return/throw; // normal execution'."
+        )
+    ),
+    "dead_code": (
+        Technique(
+            technique="Remove Dead Code",
+            description="Simply delete unreachable or never-executed code.",
+            example="Delete commented-out code blocks, unreachable code, and unused methods."
+        ),
+        Technique(
+            technique="Inline Method",
+            description="If a method is only used once, consider inlining it.",
+            example="Replace 'result = calculateTemp(); return result;' with 'return calculateTemp();'."
+        )
+    ),
+    "comment_overuse": (
+        Technique(
+            technique="Rename Method",
+            description="Rename methods and variables to better reflect their purpose, reducing the need for comments.",
+            example="Replace 'getD()' with 'getDiscount()' and remove the comment explaining it's for discounts."
+        ),
+        Technique(
+            technique="Extract Method",
+            description="Extract complex logic into well-named methods that serve as self-documentation.",
+            example="Replace a complex algorithm with a call to a descriptively named method."
+        ),
+        Technique(
+            technique="Introduce Assertion",
+            description="Replace comments about assumptions with assertions.",
+            example="Replace '// x must be positive' with 'assert x > 0'."
+        )
+    )
+}
+
+# Fixed text of the refactoring enhancement prompt, filled in by _create_enhancement_prompt
+_PROMPT_HEADER = """
         You are an expert software refactoring advisor. Your task is to enhance the following refactoring suggestions 
         with more context-specific advice based on the actual code.
         
         # File Information
-        - Path: {file_path}
+        - Path: """
+_PROMPT_CODE_OPEN = """
         
         # Code Content
         ```
-        {file_content}
+        """
+_PROMPT_SMELLS = """
         ```
         
         # Detected Code Smells
-        {smells_str}
+        """
+_PROMPT_SUGGESTIONS = """
         
         # Initial Refactoring Suggestions
-        {suggestions_str}
+        """
+_PROMPT_FOOTER = """
         
         # Task
         For each refactoring suggestion:
@@ -256,7 +164,7 @@ class RefactoringAdvisor:
         Provide your enhanced suggestions in the following JSON format:
         ```json
         [
-            {{
+            {
                 "smell_type": "original smell type",
                 "technique": "original technique",
                 "specific_application": "context-specific description",
@@ -265,26 +173,307 @@ class RefactoringAdvisor:
                 "related_refactorings": ["related technique 1", "related technique 2"],
                 "affected_area": "original affected area",
                 "severity": "original severity"
-            }}
+            }
         ]
         ```
         
         Ensure your response contains valid JSON with only the enhanced suggestions array and no additional text.
         """
+
+# Line numbers in a smell's "lines" field, e.g. "12", "10-25" or "L10-L25, 40-52"
+_LINE_RANGE_RE = re.compile(r'L?(\d+)(?:\s*-\s*L?(\d+))?')
+
+# Excerpts covering more than this fraction of a file are replaced by the full file
+_MAX_EXCERPT_RATIO = 0.7
+
+_JSON_FENCE = "```json"
+_FENCE = "```"
+
+def _extract_json_block(llm_response: str) -> str:
+    """Return the body of the first fenced ```json block, or the whole response if there is none"""
+    start = llm_response.find(_JSON_FENCE)
+    if start != -1:
+        start += len(_JSON_FENCE)
+        end = llm_response.find(_FENCE, start)
+        if end != -1:
+            return llm_response[start:end].strip()
+    return llm_response
+
+class RefactoringAdvisor:
+    """Agent responsible for suggesting refactoring techniques based on code analysis"""
     
-    def _process_llm_enhancement_response(self, llm_response: str, initial_suggestions: List[Dict]) -> List[Dict]:
-        """Process the LLM response to extract enhanced suggestions"""
-        try:
-            import json
-            import re
+    def __init__(self, min_smells_for_llm: int = 3, template_only_smell_types: Tuple[str, ...] = ("dead_code", "comment_overuse"),
+                 max_context_lines: int = 200, context_window: int = 20):
+        self.logger = logging.getLogger(__name__)
+        
+        # LLM enhancement policy: a file is sent to the LLM only if it has a high severity
+        # smell or more than min_smells_for_llm smells, and not all of its smells are of
+        # types the static templates already cover fully
+        self.min_smells_for_llm = min_smells_for_llm
+        self.template_only_smell_types = frozenset(template_only_smell_types)
+        
+        # Files longer than max_context_lines are embedded in the prompt as excerpts of
+        # context_window lines around each smell rather than in full
+        self.max_context_lines = max_context_lines
+        self.context_window = context_window
+        
+        # LLM responses keyed by a digest of the enhancement prompt, which covers the
+        # file path, file content and detected smells
+        self._llm_cache = ContentCache(max_size=512)
+        
+        # Persistent copy of the same responses, so unchanged files skip the LLM across runs
+        self._disk_cache = DiskCache(
+            settings.REFACTORING_CACHE_DIR,
+            ttl_sec=settings.REFACTORING_CACHE_TTL_SEC,
+            max_entries=settings.REFACTORING_CACHE_MAX_ENTRIES
+        ) if settings.REFACTORING_CACHE_DIR else None
+        
+        # Refactoring techniques mapped to code smells
+        self.refactoring_techniques = _REFACTORING_TECHNIQUES
+        
+        # Suggestion fields that depend only on the technique, shaped once here so
+        # building suggestions is a dict merge per technique
+        self._smell_to_templates = {
+            smell_type: [
+                {
+                    "technique": technique.technique,
+                    "description": technique.description,
+                    "example": technique.example
+                }
+                for technique in techniques
+            ]
+            for smell_type, techniques in self.refactoring_techniques.items()
+        }
+        
+        # Fallback used for unknown smell types
+        self._generic_templates = [{
+            "technique": "Refactor based on best practices",
+            "description": "Consider refactoring this code using standard techniques.",
+            "example": "Review the code for clarity, simplicity, and maintainability."
+        }]
+
+    async def suggest_refactorings(self, file_path: str, file_content: str, analysis_results: Dict) -> Dict:
+        """Suggest refactoring techniques based on analysis results"""
+        results = await self.suggest_refactorings_batch([(file_path, file_content, analysis_results)])
+        return results[0]
+    
+    async def suggest_refactorings_batch(self, items: List[Tuple[str, str, Dict]]) -> List[Dict]:
+        """Suggest refactorings for several (file_path, file_content, analysis_results) items,
+        enhancing all of them with one batched LLM call"""
+        results = []
+        pending = []  # (result, file_path, file_content, code_smells, suggestions) awaiting enhancement
+        
+        for file_path, file_content, analysis_results in items:
+            try:
+                # Extract code smells from analysis results
+                code_smells = analysis_results.get("data", {}).get("analysis", {}).get("code_smells", [])
+                
+                # Generate refactoring suggestions
+                refactoring_suggestions = self._generate_refactoring_suggestions(code_smells)
+                
+                result = {
+                    "status": "success",
+                    "file_path": file_path,
+                    "refactoring_suggestions": refactoring_suggestions
+                }
+                
+                # Only files with smells and suggestions are worth an LLM call
+                if refactoring_suggestions and self._needs_llm_enhancement(code_smells):
+                    pending.append((result, file_path, file_content, code_smells, refactoring_suggestions))
+                
+            except Exception as e:
+                self.logger.exception("Error generating refactoring suggestions for %s", file_path)
+                result = {
+                    "status": "error",
+                    "message": f"Error generating refactoring suggestions: {str(e)}",
+                    "file_path": file_path
+                }
             
-            # Try to extract JSON from the response
-            json_match = re.search(r'```json\s*([\s\S]*?)\s*```', llm_response)
-            if json_match:
-                json_str = json_match.group(1)
+            results.append(result)
+        
+        # Enhance suggestions with LLM insights
+        if pending:
+            try:
+                enhanced = await self.enhance_many([entry[1:] for entry in pending])
+            except Exception:
+                # Keep the initial suggestions already in each result
+                self.logger.exception("Error enhancing suggestions with LLM")
             else:
-                # If no JSON block is found, try to parse the whole response
-                json_str = llm_response
+                for (result, *_), enhanced_suggestions in zip(pending, enhanced):
+                    result["refactoring_suggestions"] = enhanced_suggestions
+        
+        return results
+    
+    def _generate_refactoring_suggestions(self, code_smells: List[Dict]) -> List[Dict]:
+        """Generate initial refactoring suggestions based on detected code smells"""
+        suggestions = []
+        
+        for smell in code_smells:
+            smell_type = smell.get("type")
+            base = {
+                "smell_type": smell_type,
+                "smell_description": smell.get("description", ""),
+                "affected_area": smell.get("lines", "")
+            }
+            severity = smell.get("severity", "medium")
+            
+            # Get appropriate refactoring techniques for this smell type
+            for template in self._smell_to_templates.get(smell_type, self._generic_templates):
+                suggestion = {**base, **template}
+                suggestion["severity"] = severity
+                suggestions.append(suggestion)
+        
+        return suggestions
+    
+    def _needs_llm_enhancement(self, code_smells: List[Dict]) -> bool:
+        """Decide whether the LLM is likely to add anything over the template suggestions"""
+        if not code_smells:
+            return False
+        if all(smell.get("type") in self.template_only_smell_types for smell in code_smells):
+            return False
+        return len(code_smells) > self.min_smells_for_llm or any(smell.get("severity") == "high" for smell in code_smells)
+    
+    async def enhance_many(self, file_prompts: List[Tuple[str, str, List[Dict], List[Dict]]]) -> List[List[Dict]]:
+        """Enhance refactoring suggestions for several (file_path, file_content, code_smells,
+        initial_suggestions) entries using a single batched LLM call"""
+        # Prepare the prompts for the LLM
+        prompts = [
+            self._create_enhancement_prompt(file_path, self._excerpt_file_content(file_content, code_smells), code_smells, initial_suggestions)
+            for file_path, file_content, code_smells, initial_suggestions in file_prompts
+        ]
+        
+        # Reuse cached responses for prompts seen before (unchanged file and smells),
+        # and send each remaining distinct prompt to the LLM service only once
+        cache_keys = [content_digest(prompt) for prompt in prompts]
+        llm_responses = [self._llm_cache.get(key) for key in cache_keys]
+        if self._disk_cache is not None and any(response is None for response in llm_responses):
+            llm_responses = await run_in_thread(self._read_disk_cache, cache_keys, llm_responses)
+        missing = defaultdict(list)  # cache key -> indices of the prompts sharing it
+        for i, response in enumerate(llm_responses):
+            if response is None:
+                missing[cache_keys[i]].append(i)
+        if missing:
+            fetched = await llm_service.batch_call([prompts[indices[0]] for indices in missing.values()])
+            for (key, indices), response in zip(missing.items(), fetched):
+                for i in indices:
+                    llm_responses[i] = response
+        
+        # Process the LLM responses off the event loop, in one hop for the whole batch
+        parsed = await run_in_thread(self._process_llm_responses, file_prompts, llm_responses)
+        
+        # Only responses that parsed are cached, so a truncated or malformed reply is retried
+        # instead of pinning the file to its initial suggestions
+        enhanced = []
+        new_entries = {}  # cache key -> fetched response to persist
+        for (_, _, _, initial_suggestions), key, response, suggestions in zip(file_prompts, cache_keys, llm_responses, parsed):
+            if suggestions is None or not isinstance(response, str):
+                enhanced.append(initial_suggestions)
+                continue
+            self._llm_cache.set(key, response)
+            if key in missing:
+                new_entries[key] = response
+            enhanced.append(suggestions)
+        
+        if new_entries and self._disk_cache is not None:
+            await run_in_thread(self._write_disk_cache, new_entries)
+        
+        return enhanced
+    
+    def _process_llm_responses(self, file_prompts: List[Tuple[str, str, List[Dict], List[Dict]]], llm_responses: List[Any]) -> List[Optional[List[Dict]]]:
+        """Process a batch of LLM responses, giving None for failed calls and unparsable responses"""
+        enhanced = []
+        for (file_path, _, _, initial_suggestions), llm_response in zip(file_prompts, llm_responses):
+            if isinstance(llm_response, Exception):
+                self.logger.error("Error enhancing suggestions with LLM for %s: %s", file_path, llm_response)
+                enhanced.append(None)
+            else:
+                enhanced.append(self._process_llm_enhancement_response(llm_response, initial_suggestions))
+        
+        return enhanced
+    
+    def _read_disk_cache(self, cache_keys: List[bytes], llm_responses: List[Optional[str]]) -> List[Optional[str]]:
+        """Fill in the responses missing from memory from the disk cache"""
+        return [
+            self._disk_cache.get(key) if response is None else response
+            for key, response in zip(cache_keys, llm_responses)
+        ]
+    
+    def _write_disk_cache(self, entries: Dict[bytes, str]) -> None:
+        """Persist newly fetched responses to the disk cache"""
+        for key, response in entries.items():
+            self._disk_cache.set(key, response)
+    
+    def clear_cache(self) -> None:
+        """Invalidate cached LLM responses, in memory and on disk"""
+        self._llm_cache.clear()
+        if self._disk_cache is not None:
+            self._disk_cache.clear()
+    
+    def _excerpt_file_content(self, file_content: str, code_smells: List[Dict]) -> str:
+        """Reduce a large file to numbered excerpts around its smells for the enhancement prompt"""
+        lines = file_content.split('\n')
+        if len(lines) <= self.max_context_lines:
+            return file_content
+        
+        # Collect the line ranges of all smells, widened by the context window
+        ranges = []
+        for smell in code_smells:
+            affected_area = smell.get("lines")
+            matches = _LINE_RANGE_RE.findall(affected_area) if isinstance(affected_area, str) else []
+            if not matches:
+                # Smells without line numbers (e.g. "entire file") need the whole file
+                return file_content
+            for first, last in matches:
+                start = max(int(first) - self.context_window, 1)
+                end = min(int(last or first) + self.context_window, len(lines))
+                if start <= end:
+                    ranges.append((start, end))
+        
+        # Merge overlapping or adjacent ranges
+        ranges.sort()
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        
+        if not merged or sum(end - start + 1 for start, end in merged) > len(lines) * _MAX_EXCERPT_RATIO:
+            return file_content
+        
+        excerpt = []
+        for start, end in merged:
+            if excerpt:
+                excerpt.append("...")
+            excerpt.extend(f"{n}: {lines[n - 1]}" for n in range(start, end + 1))
+        return "\n".join(excerpt)
+    
+    def _create_enhancement_prompt(self, file_path: str, file_content: str, code_smells: List[Dict], initial_suggestions: List[Dict]) -> str:
+        """Create a prompt for the LLM to enhance refactoring suggestions"""
+        # Assemble the prompt in one join around the fixed template text
+        parts = [_PROMPT_HEADER, file_path, _PROMPT_CODE_OPEN, file_content, _PROMPT_SMELLS]
+        
+        # Add the list of code smells
+        parts.append("\n".join([
+            f"- {smell.get('type')}: {smell.get('description')} at {smell.get('lines')} (Severity: {smell.get('severity', 'medium')})"
+            for smell in code_smells
+        ]))
+        parts.append(_PROMPT_SUGGESTIONS)
+        
+        # Add the initial suggestions
+        parts.append("\n".join([
+            f"- {s['technique']} for {s['smell_type']} at {s['affected_area']}: {s['description']}"
+            for s in initial_suggestions
+        ]))
+        parts.append(_PROMPT_FOOTER)
+        
+        return "".join(parts)
+    
+    def _process_llm_enhancement_response(self, llm_response: str, initial_suggestions: List[Dict]) -> Optional[List[Dict]]:
+        """Process the LLM response to extract enhanced suggestions, or return None if it cannot be parsed"""
+        try:
+            # Try to extract JSON from the response, falling back to the whole response
+            json_str = _extract_json_block(llm_response)
             
             # Parse the JSON
             enhanced_data = json.loads(json_str)
@@ -293,10 +482,7 @@ class RefactoringAdvisor:
             enhanced_suggestions = []
             
             # Create a mapping of initial suggestions for easy lookup
-            suggestion_map = {}
-            for suggestion in initial_suggestions:
-                key = f"{suggestion['smell_type']}:{suggestion['technique']}"
-                suggestion_map[key] = suggestion
+            suggestion_map = {(s["smell_type"], s["technique"]): s for s in initial_suggestions}
             
             # Process enhanced suggestions
             for enhanced in enhanced_data:
@@ -304,18 +490,18 @@ class RefactoringAdvisor:
                 technique = enhanced.get("technique")
                 
                 # Find corresponding initial suggestion
-                key = f"{smell_type}:{technique}"
-                original = suggestion_map.get(key)
+                original = suggestion_map.get((smell_type, technique))
                 
                 if original:
-                    # Merge the original with enhanced data
-                    merged = {**original}  # Create a copy of the original
-                    
-                    # Add enhanced fields
-                    merged["specific_application"] = enhanced.get("specific_application", merged.get("description", ""))
-                    merged["code_example"] = enhanced.get("code_example", merged.get("example", ""))
-                    merged["impact"] = enhanced.get("impact", "medium")
-                    merged["related_refactorings"] = enhanced.get("related_refactorings", [])
+                    # Merge the original with enhanced data; originals always carry
+                    # a description and example from the technique templates
+                    merged = original.copy()
+                    merged.update({
+                        "specific_application": enhanced.get("specific_application", original["description"]),
+                        "code_example": enhanced.get("code_example", original["example"]),
+                        "impact": enhanced.get("impact", "medium"),
+                        "related_refactorings": enhanced.get("related_refactorings", [])
+                    })
                     
                     enhanced_suggestions.append(merged)
                 else:
@@ -340,10 +526,10 @@ class RefactoringAdvisor:
                 
             return enhanced_suggestions
             
-        except Exception as e:
-            self.logger.exception(f"Error processing LLM enhancement response: {str(e)}")
-            # Return the initial suggestions if processing fails
-            return initial_suggestions
+        except Exception:
+            self.logger.exception("Error processing LLM enhancement response")
+            # The caller falls back to the initial suggestions
+            return None
     
     async def generate_refactoring_guide(self, file_path: str, suggestions: List[Dict]) -> Dict:
         """Generate a comprehensive refactoring guide for a file based on suggestions"""
@@ -360,49 +546,34 @@ class RefactoringAdvisor:
                     }
                 }
             
-            # Group suggestions by severity
-            high_priority = [s for s in suggestions if s.get("severity") == "high"]
-            medium_priority = [s for s in suggestions if s.get("severity") == "medium"]
-            low_priority = [s for s in suggestions if s.get("severity") == "low"]
-            
-            # Create a refactoring plan
-            refactoring_steps = []
-            
-            # First add high priority refactorings
-            for i, suggestion in enumerate(high_priority, 1):
-                refactoring_steps.append({
-                    "step": i,
-                    "title": f"Apply {suggestion['technique']} to address {suggestion['smell_type']}",
-                    "description": suggestion.get("specific_application", suggestion.get("description", "")),
-                    "code_example": suggestion.get("code_example", suggestion.get("example", "")),
-                    "priority": "high",
-                    "affected_area": suggestion.get("affected_area", ""),
-                    "related_steps": self._find_related_step_numbers(suggestion, suggestions)
-                })
+            # Group suggestions by severity in one pass; unknown severities are treated as medium
+            buckets = {"high": [], "medium": [], "low": []}
+            for suggestion in suggestions:
+                severity = suggestion.get("severity", "medium")
+                bucket = buckets.get(severity) if isinstance(severity, str) else None
+                if bucket is None:
+                    bucket = buckets["medium"]
+                bucket.append(suggestion)
+            high_priority, medium_priority, low_priority = buckets["high"], buckets["medium"], buckets["low"]
             
-            # Then medium priority
-            for i, suggestion in enumerate(medium_priority, len(high_priority) + 1):
-                refactoring_steps.append({
-                    "step": i,
-                    "title": f"Apply {suggestion['technique']} to address {suggestion['smell_type']}",
-                    "description": suggestion.get("specific_application", suggestion.get("description", "")),
-                    "code_example": suggestion.get("code_example", suggestion.get("example", "")),
-                    "priority": "medium",
-                    "affected_area": suggestion.get("affected_area", ""),
-                    "related_steps": self._find_related_step_numbers(suggestion, suggestions)
-                })
+            # Index suggestions once so related steps are lookups rather than rescans
+            related_index = self._index_suggestions(suggestions)
             
-            # Finally low priority
-            for i, suggestion in enumerate(low_priority, len(high_priority) + len(medium_priority) + 1):
-                refactoring_steps.append({
-                    "step": i,
-                    "title": f"Apply {suggestion['technique']} to address {suggestion['smell_type']}",
-                    "description": suggestion.get("specific_application", suggestion.get("description", "")),
-                    "code_example": suggestion.get("code_example", suggestion.get("example", "")),
-                    "priority": "low",
-                    "affected_area": suggestion.get("affected_area", ""),
-                    "related_steps": self._find_related_step_numbers(suggestion, suggestions)
-                })
+            # Create a refactoring plan: high priority first, then medium, then low
+            refactoring_steps = []
+            step = 1
+            for priority, bucket in buckets.items():
+                for suggestion in bucket:
+                    refactoring_steps.append({
+                        "step": step,
+                        "title": f"Apply {suggestion['technique']} to address {suggestion['smell_type']}",
+                        "description": suggestion.get("specific_application", suggestion.get("description", "")),
+                        "code_example": suggestion.get("code_example", suggestion.get("example", "")),
+                        "priority": priority,
+                        "affected_area": suggestion.get("affected_area", ""),
+                        "related_steps": self._find_related_step_numbers(suggestion, suggestions, related_index)
+                    })
+                    step += 1
             
             # Create a summary
             summary = f"This guide contains {len(refactoring_steps)} refactoring steps: " \
@@ -424,39 +595,52 @@ class RefactoringAdvisor:
             }
             
         except Exception as e:
-            self.logger.exception(f"Error generating refactoring guide for {file_path}: {str(e)}")
+            self.logger.exception("Error generating refactoring guide for %s", file_path)
             return {
                 "status": "error",
                 "message": f"Error generating refactoring guide: {str(e)}",
                 "file_path": file_path
             }
     
-    def _find_related_step_numbers(self, current_suggestion: Dict, all_suggestions: List[Dict]) -> List[int]:
+    def _index_suggestions(self, suggestions: List[Dict]) -> Tuple[Dict, Dict, Dict]:
+        """Map technique, affected area and smell type to the 1-based positions of the suggestions that have them"""
+        by_technique = defaultdict(list)
+        by_area = defaultdict(list)
+        by_smell = defaultdict(list)
+        
+        for i, suggestion in enumerate(suggestions, 1):
+            by_technique[suggestion.get("technique")].append(i)
+            affected_area = suggestion.get("affected_area")
+            if affected_area:
+                by_area[affected_area].append(i)
+            by_smell[suggestion.get("smell_type")].append(i)
+        
+        return by_technique, by_area, by_smell
+    
+    def _find_related_step_numbers(self, current_suggestion: Dict, all_suggestions: List[Dict], related_index: Tuple[Dict, Dict, Dict] = None) -> List[int]:
         """Find steps related to the current suggestion"""
-        related_steps = []
+        if related_index is None:
+            related_index = self._index_suggestions(all_suggestions)
+        by_technique, by_area, by_smell = related_index
         
-        # If the suggestion has explicitly defined related refactorings
-        related_techniques = current_suggestion.get("related_refactorings", [])
+        # Suggestions addressing the same smell type
+        related_steps = set(by_smell.get(current_suggestion.get("smell_type"), ()))
         
-        # Find techniques that are related
-        for i, suggestion in enumerate(all_suggestions, 1):
-            # Skip the current suggestion
-            if suggestion is current_suggestion:
-                continue
-                
-            # Check if this suggestion's technique is in the related techniques list
-            if suggestion["technique"] in related_techniques:
-                related_steps.append(i)
-                
-            # Check if they affect the same area
-            elif suggestion.get("affected_area") == current_suggestion.get("affected_area") and suggestion.get("affected_area"):
-                related_steps.append(i)
-                
-            # Check if they address the same smell type
-            elif suggestion.get("smell_type") == current_suggestion.get("smell_type"):
-                related_steps.append(i)
+        # Suggestions affecting the same area
+        affected_area = current_suggestion.get("affected_area")
+        if affected_area:
+            related_steps.update(by_area.get(affected_area, ()))
+        
+        # Suggestions whose technique is explicitly listed as related
+        related_techniques = current_suggestion.get("related_refactorings", [])
+        if isinstance(related_techniques, str):
+            related_techniques = [related_techniques]
+        for technique in related_techniques:
+            if isinstance(technique, str):
+                related_steps.update(by_technique.get(technique, ()))
         
-        return related_steps
+        # Skip the current suggestion
+        return sorted(i for i in related_steps if all_suggestions[i - 1] is not current_suggestion)
 
 # Create an instance to be imported by other modules
 refactoring_advisor = RefactoringAdvisor()
\ No newline at end of file
@@ -1,249 +1,378 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
 import re
 import os
 
+from core.content_cache import ContentCache, content_digest
+from core.executors import run_in_thread
+
+def _match_lines(content: str, pattern: re.Pattern, needles: Tuple[str, ...], min_commas: int = 0) -> List[Tuple[int, re.Match]]:
+    """Match a line-anchored pattern against each line of content that contains one of
+    needles (literals every match must include), returning (line index, match) in order.
+    Candidate lines are located with str.find, so lines that cannot match are never
+    visited from Python. Lines with fewer than min_commas commas are skipped unmatched."""
+    line_offsets = set()
+    for needle in needles:
+        pos = content.find(needle)
+        while pos != -1:
+            line_offsets.add(content.rfind('\n', 0, pos) + 1)
+            end = content.find('\n', pos)
+            if end == -1:
+                break
+            pos = content.find(needle, end)
+    
+    results = []
+    line_index = 0
+    counted_to = 0
+    for start in sorted(line_offsets):
+        line_index += content.count('\n', counted_to, start)
+        counted_to = start
+        end = content.find('\n', start)
+        if end == -1:
+            end = len(content)
+        if min_commas and content.count(',', start, end) < min_commas:
+            continue
+        # endpos keeps the match within the line, as if the line were matched on its own
+        match = pattern.match(content, start, end)
+        if match:
+            results.append((line_index, match))
+    return results
+
+def _indent(match: re.Match) -> int:
+    """Leading whitespace width of the line a line-anchored match starts on"""
+    text = match.group(0)
+    return len(text) - len(text.lstrip())
+
+def _first_group(match: re.Match, groups: Tuple[int, ...]) -> Optional[str]:
+    """Value of the first non-empty group among groups, for patterns with alternatives"""
+    for group in groups:
+        value = match.group(group)
+        if value:
+            return value
+    return None
+
+# Declaration patterns, compiled once at import, each paired with the literals any
+# matching line must contain. They are matched against line spans of the whole
+# content, so ^ is multiline. The Java/C# patterns let the modifier group absorb
+# leading whitespace itself: a separate ^\s* before it made every split of an
+# indent between the two a backtracking path, quadratic on long blank-ish lines.
+_PY_METHOD = (re.compile(r'^\s*(async\s+)?def\s+(\w+)\s*\(', re.MULTILINE), ('def',))
+_JS_METHOD = (re.compile(r'^\s*(async\s+)?function\s+(\w+)\s*\(|^\s*(\w+)\s*[=:]\s*(async\s+)?\(?.*\)?\s*=>', re.MULTILINE), ('function', '=>'))
+_JAVA_METHOD = (re.compile(r'^(public|private|protected|static|\s)+[\w<>\[\]]+\s+(\w+)\s*\(', re.MULTILINE), ('(',))
+
+_PY_JS_CLASS = (re.compile(r'^\s*class\s+(\w+)', re.MULTILINE), ('class',))
+_JAVA_CLASS = (re.compile(r'^(public|private|protected|\s)+class\s+(\w+)', re.MULTILINE), ('class',))
+
+_PY_PARAMS = (re.compile(r'^\s*(async\s+)?def\s+(\w+)\s*\(([^)]*)\)', re.MULTILINE), ('def',))
+_JAVA_PARAMS = (re.compile(r'^(public|private|protected|static|\s)+[\w<>\[\]]+\s+(\w+)\s*\(([^)]*)\)', re.MULTILINE), ('(',))
+_JS_PARAMS = (re.compile(r'^\s*(async\s+)?function\s+(\w+)\s*\(([^)]*)\)|^\s*(\w+)\s*[=:]\s*(async\s+)?\(([^)]*)\)', re.MULTILINE), ('(',))
+
+# Block boundaries used to find where a method or class ends: Python def/class
+# lines (compared by indentation) and lines holding only a closing brace
+_PY_DEF_START = (re.compile(r'^\s*(async\s+)?def\s+', re.MULTILINE), ('def',))
+_PY_CLASS_START = (re.compile(r'^\s*class\s+', re.MULTILINE), ('class',))
+_CLOSING_BRACE_LINE = (re.compile(r'^\s*\}\s*$', re.MULTILINE), ('}',))
+
+# Everything the detectors need to know about a language, looked up once per file
+LanguageSpec = namedtuple("LanguageSpec", [
+    "method",             # Method declaration pattern (None: declaration smells unsupported)
+    "class_",             # Class declaration pattern
+    "class_name_group",   # Group holding the class name
+    "params",             # Method declaration pattern capturing the parameter list
+    "param_name_groups",  # Groups that may hold the method name, first non-empty wins
+    "param_list_groups",  # Groups that may hold the parameter list, first non-empty wins
+    "indent_blocks",      # Blocks end at the next declaration with the same or less indentation
+    "method_end",         # Pattern for lines that can end a method
+    "class_end",          # Pattern for lines that can end a class
+    "comment_prefixes"    # Line comment markers, for the dead code and comment overuse checks
+])
+
+_C_STYLE_COMMENT_PREFIXES = ('//', '/*', '*')
+_PYTHON = LanguageSpec(_PY_METHOD, _PY_JS_CLASS, 1, _PY_PARAMS, (2,), (3,), True, _PY_DEF_START, _PY_CLASS_START, ('#',))
+_JAVASCRIPT = LanguageSpec(_JS_METHOD, _PY_JS_CLASS, 1, _JS_PARAMS, (2, 4), (3, 6), False, _CLOSING_BRACE_LINE, _CLOSING_BRACE_LINE, _C_STYLE_COMMENT_PREFIXES)
+_JAVA = LanguageSpec(_JAVA_METHOD, _JAVA_CLASS, 2, _JAVA_PARAMS, (2,), (3,), False, _CLOSING_BRACE_LINE, _CLOSING_BRACE_LINE, _C_STYLE_COMMENT_PREFIXES)
+_C = LanguageSpec(None, None, None, None, None, None, False, None, None, _C_STYLE_COMMENT_PREFIXES)
+_LANGUAGES = {
+    '.py': _PYTHON,
+    '.js': _JAVASCRIPT,
+    '.ts': _JAVASCRIPT,
+    '.java': _JAVA,
+    '.cs': _JAVA,
+    '.c': _C,
+    '.cpp': _C,
+}
+
+# Larger files (usually generated or minified) are not scanned for smells
+_MAX_SCAN_CHARS = 1_000_000
+
+# Files at least this long are scanned in the shared thread pool to keep the event
+# loop free; smaller ones scan in about a millisecond, so they run inline
+_THREAD_SCAN_MIN_CHARS = 20_000
+
+# Code-like patterns that mark a comment block as commented-out code
+_CODE_INDICATORS = ('if', 'for', 'while', 'function', 'class', 'return', 'var ', 'let ', 'const ')
+
+class _FileContext:
+    """Per-file state shared by the detectors, built once in detect_smells"""
+    
+    def __init__(self, content: str, language: Optional[LanguageSpec]):
+        self.content = content
+        self.language = language
+        self._matches = {}
+    
+    def match_lines(self, pattern: Tuple[re.Pattern, Tuple[str, ...]], min_commas: int = 0) -> List[Tuple[int, re.Match]]:
+        """_match_lines over the file, computed once per pattern (method declarations
+        and closing braces are needed by more than one detector)"""
+        key = (pattern, min_commas)
+        matches = self._matches.get(key)
+        if matches is None:
+            matches = self._matches[key] = _match_lines(self.content, *pattern, min_commas=min_commas)
+        return matches
+
 class SmellDetector:
     """Detect code smells in source code files"""
     
     def __init__(self):
+        # Detectors that locate declarations with their own pre-filtered scans
         self.smell_detectors = {
             "long_method": self._detect_long_method,
             "large_class": self._detect_large_class,
-            "long_parameter_list": self._detect_long_parameter_list,
-            "duplicate_code": self._detect_duplicate_code,
-            "complex_conditional": self._detect_complex_conditional,
-            "dead_code": self._detect_dead_code,
-            "comment_overuse": self._detect_comment_overuse
+            "long_parameter_list": self._detect_long_parameter_list
         }
+        # Smells keyed by (extension, content digest), so unchanged files are not rescanned
+        self._cache = ContentCache(max_size=1024)
     
     async def detect_smells(self, file_path: str, content: str) -> List[Dict]:
         """Detect code smells in a file"""
-        smells = []
+        if len(content) > _MAX_SCAN_CHARS:
+            return []
         
-        for smell_type, detector in self.smell_detectors.items():
-            detected = await detector(file_path, content)
-            smells.extend(detected)
+        ext = os.path.splitext(file_path)[1].lower()
+        cache_key = (ext, content_digest(content))
+        cached = self._cache.get(cache_key)
+        if cached is None:
+            if len(content) >= _THREAD_SCAN_MIN_CHARS:
+                cached = await run_in_thread(self._detect_smells_uncached, ext, content)
+            else:
+                cached = self._detect_smells_uncached(ext, content)
+            self._cache.set(cache_key, cached)
         
-        return smells
+        # Hand out copies so callers cannot alter the cached smells
+        return [smell.copy() for smell in cached]
+    
+    def _detect_smells_uncached(self, ext: str, content: str) -> List[Dict]:
+        """Run every detector over a file"""
+        language = _LANGUAGES.get(ext)
+        ctx = _FileContext(content, language)
+        
+        # Declaration smells need a supported language
+        results = []
+        if language is not None and language.method is not None:
+            results = [detector(ctx) for detector in self.smell_detectors.values()]
+        
+        # The line-based smells (duplicate code, complex conditionals, dead code and
+        # comment overuse) come from one fused pass over the lines
+        results.append(self._scan_lines(ctx))
+        
+        return [smell for detected in results for smell in detected]
     
-    async def _detect_long_method(self, file_path: str, content: str) -> List[Dict]:
+    def _detect_long_method(self, ctx: _FileContext) -> List[Dict]:
         """Detect methods that are too long"""
         smells = []
-        ext = os.path.splitext(file_path)[1].lower()
-        lines = content.split('\n')
+        language = ctx.language
         
-        # Define patterns for method/function declarations by language
-        if ext == '.py':
-            method_pattern = r'^\s*(async\s+)?def\s+(\w+)\s*\('
-        elif ext in ['.js', '.ts']:
-            method_pattern = r'^\s*(async\s+)?function\s+(\w+)\s*\(|^\s*(\w+)\s*[=:]\s*(async\s+)?\(?.*\)?\s*=>'
-        elif ext in ['.java', '.cs']:
-            method_pattern = r'^\s*(public|private|protected|static|\s)+[\w<>\[\]]+\s+(\w+)\s*\('
+        # Find method starts and possible method ends from pre-filtered candidate
+        # lines, then walk the (few) matches instead of every line
+        starts = ctx.match_lines(language.method)
+        if not starts:
+            return []
+        if language.indent_blocks:
+            # A method ends at the next def with the same or less indentation
+            end_matches = [(i, _indent(m)) for i, m in ctx.match_lines(language.method_end)]
         else:
-            return []  # Unsupported language
+            # Simple brace counting method end detection
+            end_matches = [(i, 0) for i, _ in ctx.match_lines(language.method_end)]
+        end_lines = [line for line, _ in end_matches]
         
-        # Track current method and its lines
-        current_method = None
-        method_start_line = 0
-        method_lines = 0
-        
-        for i, line in enumerate(lines):
-            # Check if line marks the start of a method
-            match = re.match(method_pattern, line)
-            if match and not current_method:
-                current_method = match.group(2) if match.group(2) else match.group(3)
-                method_start_line = i
-                method_lines = 0
+        # Starts inside a method are ignored, so resume after each method's end
+        resume_line = 0
+        for method_start_line, match in starts:
+            if method_start_line < resume_line:
+                continue
+            current_method = match.group(2) if match.group(2) else match.group(3)
             
-            # Count lines in the current method
-            if current_method:
-                method_lines += 1
-                
-                # Check for method end (Python indentation or braces)
-                if ext == '.py':
-                    # Check if we've reached a new def with same or less indentation
-                    if i > method_start_line and re.match(r'^\s*(async\s+)?def\s+', line):
-                        leading_spaces_current = len(lines[method_start_line]) - len(lines[method_start_line].lstrip())
-                        leading_spaces_new = len(line) - len(line.lstrip())
-                        if leading_spaces_new <= leading_spaces_current:
-                            # Method ended
-                            if method_lines > 30:  # Threshold for long method
-                                smells.append({
-                                    "type": "long_method",
-                                    "description": f"Method '{current_method}' is too long ({method_lines} lines)",
-                                    "lines": f"{method_start_line+1}-{i}",
-                                    "severity": "high" if method_lines > 50 else "medium"
-                                })
-                            current_method = None
-                elif '}' in line and line.strip() == '}':
-                    # Simple brace counting method end detection
-                    if method_lines > 30:  # Threshold for long method
-                        smells.append({
-                            "type": "long_method",
-                            "description": f"Method '{current_method}' is too long ({method_lines} lines)",
-                            "lines": f"{method_start_line+1}-{i+1}",
-                            "severity": "high" if method_lines > 50 else "medium"
-                        })
-                    current_method = None
+            if language.indent_blocks:
+                leading_spaces_current = _indent(match)
+                j = bisect_right(end_lines, method_start_line)
+                while j < len(end_matches) and end_matches[j][1] > leading_spaces_current:
+                    j += 1
+            else:
+                j = bisect_left(end_lines, method_start_line)
+            if j == len(end_matches):
+                break  # The method never ends
+            
+            end_line = end_lines[j]
+            method_lines = end_line - method_start_line + 1
+            if method_lines > 30:  # Threshold for long method
+                smells.append({
+                    "type": "long_method",
+                    "description": f"Method '{current_method}' is too long ({method_lines} lines)",
+                    # A Python method ends on the line before the next def
+                    "lines": f"{method_start_line+1}-{end_line if language.indent_blocks else end_line+1}",
+                    "severity": "high" if method_lines > 50 else "medium"
+                })
+            resume_line = end_line + 1
         
         return smells
     
-    async def _detect_large_class(self, file_path: str, content: str) -> List[Dict]:
+    def _detect_large_class(self, ctx: _FileContext) -> List[Dict]:
         """Detect classes that are too large"""
         smells = []
-        ext = os.path.splitext(file_path)[1].lower()
-        lines = content.split('\n')
-        
-        # Define patterns for class declarations by language
-        if ext == '.py':
-            class_pattern = r'^\s*class\s+(\w+)'
-        elif ext in ['.js', '.ts']:
-            class_pattern = r'^\s*class\s+(\w+)'
-        elif ext in ['.java', '.cs']:
-            class_pattern = r'^\s*(public|private|protected|\s)+class\s+(\w+)'
-        else:
-            return []  # Unsupported language
-        
-        # Track current class and its metrics
-        current_class = None
-        class_start_line = 0
-        class_lines = 0
-        method_count = 0
+        language = ctx.language
         
-        # Method detection patterns
-        if ext == '.py':
-            method_pattern = r'^\s*(async\s+)?def\s+(\w+)\s*\('
-        elif ext in ['.js', '.ts']:
-            method_pattern = r'^\s*(async\s+)?function\s+(\w+)\s*\(|^\s*(\w+)\s*[=:]\s*(async\s+)?\(?.*\)?\s*=>'
-        elif ext in ['.java', '.cs']:
-            method_pattern = r'^\s*(public|private|protected|static|\s)+[\w<>\[\]]+\s+(\w+)\s*\('
+        # Find class starts, method declarations and possible class ends from
+        # pre-filtered candidate lines, then walk the matches instead of every line
+        starts = ctx.match_lines(language.class_)
+        if not starts:
+            return []
+        method_lines = [i for i, _ in ctx.match_lines(language.method)]
+        if language.indent_blocks:
+            # A class ends at the next class with the same or less indentation
+            end_matches = [(i, _indent(m)) for i, m in ctx.match_lines(language.class_end)]
         else:
-            method_pattern = None
+            # Simple brace counting class end detection (with minimum size check)
+            end_matches = [(i, 0) for i, _ in ctx.match_lines(language.class_end)]
+        end_lines = [line for line, _ in end_matches]
+        group_idx = language.class_name_group
         
-        for i, line in enumerate(lines):
-            # Check if line marks the start of a class
-            class_match = re.match(class_pattern, line)
-            if class_match and not current_class:
-                group_idx = 2 if ext in ['.java', '.cs'] else 1
-                current_class = class_match.group(group_idx)
-                class_start_line = i
-                class_lines = 0
-                method_count = 0
+        # Starts inside a class are ignored, so resume after each class's end
+        resume_line = 0
+        for class_start_line, class_match in starts:
+            if class_start_line < resume_line:
+                continue
+            current_class = class_match.group(group_idx)
             
-            # Count lines and methods in the current class
-            if current_class:
-                class_lines += 1
-                
-                # Count methods
-                if method_pattern and re.match(method_pattern, line):
-                    method_count += 1
-                
-                # Check for class end (Python indentation or braces)
-                if ext == '.py':
-                    if i > class_start_line and re.match(r'^\s*class\s+', line):
-                        leading_spaces_current = len(lines[class_start_line]) - len(lines[class_start_line].lstrip())
-                        leading_spaces_new = len(line) - len(line.lstrip())
-                        if leading_spaces_new <= leading_spaces_current:
-                            # Class ended
-                            if class_lines > 200 or method_count > 10:
-                                smells.append({
-                                    "type": "large_class",
-                                    "description": f"Class '{current_class}' is too large ({class_lines} lines, {method_count} methods)",
-                                    "lines": f"{class_start_line+1}-{i}",
-                                    "severity": "high" if class_lines > 300 or method_count > 15 else "medium"
-                                })
-                            current_class = None
-                elif '}' in line and line.strip() == '}' and i > class_start_line + 5:
-                    # Simple brace counting class end detection (with minimum size check)
-                    if class_lines > 200 or method_count > 10:
-                        smells.append({
-                            "type": "large_class",
-                            "description": f"Class '{current_class}' is too large ({class_lines} lines, {method_count} methods)",
-                            "lines": f"{class_start_line+1}-{i+1}",
-                            "severity": "high" if class_lines > 300 or method_count > 15 else "medium"
-                        })
-                    current_class = None
+            if language.indent_blocks:
+                leading_spaces_current = _indent(class_match)
+                j = bisect_right(end_lines, class_start_line)
+                while j < len(end_matches) and end_matches[j][1] > leading_spaces_current:
+                    j += 1
+            else:
+                j = bisect_right(end_lines, class_start_line + 5)
+            if j == len(end_matches):
+                break  # The class never ends
+            
+            end_line = end_lines[j]
+            class_lines = end_line - class_start_line + 1
+            method_count = bisect_right(method_lines, end_line) - bisect_left(method_lines, class_start_line)
+            if class_lines > 200 or method_count > 10:
+                smells.append({
+                    "type": "large_class",
+                    "description": f"Class '{current_class}' is too large ({class_lines} lines, {method_count} methods)",
+                    # A Python class ends on the line before the next class
+                    "lines": f"{class_start_line+1}-{end_line if language.indent_blocks else end_line+1}",
+                    "severity": "high" if class_lines > 300 or method_count > 15 else "medium"
+                })
+            resume_line = end_line + 1
         
         return smells
     
-    async def _detect_long_parameter_list(self, file_path: str, content: str) -> List[Dict]:
+    def _detect_long_parameter_list(self, ctx: _FileContext) -> List[Dict]:
         """Detect methods with too many parameters"""
         smells = []
-        ext = os.path.splitext(file_path)[1].lower()
-        lines = content.split('\n')
-        
-        # Define patterns for method declarations with parameter lists
-        if ext == '.py':
-            method_pattern = r'^\s*(async\s+)?def\s+(\w+)\s*\(([^)]*)\)'
-        elif ext in ['.js', '.ts']:
-            method_pattern = r'^\s*(async\s+)?function\s+(\w+)\s*\(([^)]*)\)|^\s*(\w+)\s*[=:]\s*(async\s+)?\(([^)]*)\)'
-        elif ext in ['.java', '.cs']:
-            method_pattern = r'^\s*(public|private|protected|static|\s)+[\w<>\[\]]+\s+(\w+)\s*\(([^)]*)\)'
-        else:
-            return []  # Unsupported language
+        language = ctx.language
         
-        for i, line in enumerate(lines):
-            # Look for method declarations
-            match = re.match(method_pattern, line)
-            if match:
-                # Extract parameter list
-                params = match.group(3) if ext in ['.py', '.java', '.cs'] else (match.group(3) or match.group(6))
-                
-                # Skip empty parameters
-                if not params or params.strip() == '':
-                    continue
-                    
-                # Count parameters
-                param_count = len([p for p in params.split(',') if p.strip()])
+        # Look for method declarations on pre-filtered candidate lines. More than
+        # four parameters need at least four commas, so other lines skip the regex.
+        for i, match in ctx.match_lines(language.params, min_commas=4):
+            # Extract parameter list
+            params = _first_group(match, language.param_list_groups)
+            
+            # Skip empty parameters
+            if not params or params.strip() == '':
+                continue
                 
-                # Check if parameter count exceeds threshold
-                if param_count > 4:
-                    method_name = match.group(2) if ext in ['.py', '.java', '.cs'] else (match.group(2) or match.group(4))
-                    smells.append({
-                        "type": "long_parameter_list",
-                        "description": f"Method '{method_name}' has too many parameters ({param_count})",
-                        "lines": f"{i+1}",
-                        "severity": "high" if param_count > 6 else "medium"
-                    })
+            # Count parameters
+            param_count = len([p for p in params.split(',') if p.strip()])
+            
+            # Check if parameter count exceeds threshold
+            if param_count > 4:
+                method_name = _first_group(match, language.param_name_groups)
+
+                smells.append({
+                    "type": "long_parameter_list",
+                    "description": f"Method '{method_name}' has too many parameters ({param_count})",
+                    "lines": f"{i+1}",
+                    "severity": "high" if param_count > 6 else "medium"
+                })
         
         return smells
     
-    async def _detect_duplicate_code(self, file_path: str, content: str) -> List[Dict]:
-        """Basic detection of duplicate code blocks (simplified for MVP)"""
-        smells = []
-        lines = content.split('\n')
+    def _scan_lines(self, ctx: _FileContext) -> List[Dict]:
+        """Detect duplicate code, complex conditionals, dead code and comment overuse in a single pass over the lines"""
+        language = ctx.language
+        lines = ctx.content.split('\n')
+        # No prefixes for unknown languages: startswith(()) is always False
+        comment_prefixes = language.comment_prefixes if language is not None else ()
         
-        # Simple approach: look for blocks of 6+ identical lines
+        # Duplicate code: blocks of 6+ identical lines (simplified for MVP)
+        duplicate_runs = []  # [start, first occurrence start, last start] per run of duplicate windows
         block_size = 6
-        seen_blocks = {}
+        seen_blocks = {}  # Window hash -> first start line
+        colliding_blocks = {}  # Window lines -> first start line, for hash collisions
+        skippable_in_window = 0  # Empty or comment-only lines among the last block_size lines
+        skippable = []
         
-        for i in range(len(lines) - block_size + 1):
-            block = '\n'.join(lines[i:i+block_size])
-            # Skip empty or comment-only blocks
-            if all(line.strip() == '' or line.strip().startswith(('#', '//', '/*')) for line in lines[i:i+block_size]):
-                continue
-                
-            if block in seen_blocks:
-                first_occurrence = seen_blocks[block]
-                smells.append({
-                    "type": "duplicate_code",
-                    "description": f"Duplicate code block found",
-                    "lines": f"{i+1}-{i+block_size}, {first_occurrence+1}-{first_occurrence+block_size}",
-                    "severity": "medium"
-                })
-            else:
-                seen_blocks[block] = i
+        # Complex conditionals
+        conditional_smells = []
         
-        return smells
-    
-    async def _detect_complex_conditional(self, file_path: str, content: str) -> List[Dict]:
-        """Detect overly complex conditional expressions"""
-        smells = []
-        lines = content.split('\n')
+        # Dead code: blocks of commented-out code
+        dead_code_smells = []
+        comment_block_start = None
+        consecutive_comments = 0
+        
+        # Comment overuse
+        comment_lines = 0
+        code_lines = 0
         
         for i, line in enumerate(lines):
-            # Look for if statements with multiple conditions
-            if 'if ' in line or 'elif ' in line:
+            stripped = line.strip()
+            is_comment = stripped.startswith(comment_prefixes)
+            
+            # Duplicate code: skip empty or comment-only blocks
+            is_skippable = stripped == '' or stripped.startswith(('#', '//', '/*'))
+            skippable.append(is_skippable)
+            skippable_in_window += is_skippable
+            if i >= block_size:
+                skippable_in_window -= skippable[i - block_size]
+            if i >= block_size - 1 and skippable_in_window < block_size:
+                start = i - block_size + 1
+                # Key on the hash of the tuple of line strings (whose own hashes are
+                # cached), so no joined copy is built and only an int stays resident.
+                # A hit is confirmed against the lines of the first occurrence.
+                block = tuple(lines[start:i+1])
+                key = hash(block)
+                first_occurrence = seen_blocks.get(key)
+                if first_occurrence is None:
+                    seen_blocks[key] = start
+                elif tuple(lines[first_occurrence:first_occurrence+block_size]) != block:
+                    # A different block with the same hash: track it by content instead
+                    first_occurrence = colliding_blocks.setdefault(block, start)
+                    if first_occurrence == start:
+                        first_occurrence = None
+                if first_occurrence is not None:
+                    # A window that continues the previous duplicate on both sides
+                    # extends it, so a long copied block is reported once
+                    run = duplicate_runs[-1] if duplicate_runs else None
+                    if run is not None and start == run[2] + 1 and first_occurrence == run[1] + start - run[0]:
+                        run[2] = start
+                    else:
+                        duplicate_runs.append([start, first_occurrence, start])
+            
+            # Complex conditionals: if statements with multiple conditions ('if '
+            # also matches 'elif ' lines, so one substring test filters both)
+            if 'if ' in line:
                 and_count = line.count(' and ')
                 or_count = line.count(' or ')
                 not_count = line.count(' not ')
@@ -254,46 +383,23 @@ class SmellDetector:
                 
                 # Check complexity threshold
                 if operator_count > 2 or ternary_count > 2:
-                    smells.append({
+                    conditional_smells.append({
                         "type": "complex_conditional",
                         "description": f"Complex conditional with {operator_count} logical operators",
                         "lines": f"{i+1}",
                         "severity": "high" if operator_count > 4 else "medium"
                     })
-        
-        return smells
-    
-    async def _detect_dead_code(self, file_path: str, content: str) -> List[Dict]:
-        """Detect commented-out code and potential unused code"""
-        smells = []
-        lines = content.split('\n')
-        ext = os.path.splitext(file_path)[1].lower()
-        
-        # Check for commented-out code blocks
-        comment_block_start = None
-        consecutive_comments = 0
-        
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            
-            # Check if line is a comment
-            is_comment = False
-            if ext == '.py':
-                is_comment = stripped.startswith('#')
-            elif ext in ['.js', '.ts', '.java', '.cs', '.c', '.cpp']:
-                is_comment = stripped.startswith('//') or stripped.startswith('/*') or stripped.startswith('*')
             
+            # Dead code: look for code-like patterns in consecutive comment lines
             if is_comment:
                 consecutive_comments += 1
                 if comment_block_start is None:
                     comment_block_start = i
                 
-                # Look for code-like patterns in comments
-                code_indicators = ['if', 'for', 'while', 'function', 'class', 'return', 'var ', 'let ', 'const ']
-                has_code = any(indicator in stripped for indicator in code_indicators)
+                has_code = any(indicator in stripped for indicator in _CODE_INDICATORS)
                 
                 if has_code and consecutive_comments >= 3:
-                    smells.append({
+                    dead_code_smells.append({
                         "type": "dead_code",
                         "description": "Block of commented-out code",
                         "lines": f"{comment_block_start+1}-{i+1}",
@@ -304,34 +410,21 @@ class SmellDetector:
             else:
                 comment_block_start = None
                 consecutive_comments = 0
-        
-        return smells
-    
-    async def _detect_comment_overuse(self, file_path: str, content: str) -> List[Dict]:
-        """Detect excessive comments that could indicate code smell"""
-        smells = []
-        lines = content.split('\n')
-        ext = os.path.splitext(file_path)[1].lower()
-        
-        comment_lines = 0
-        code_lines = 0
-        
-        for line in lines:
-            stripped = line.strip()
-            if not stripped:
-                continue
-                
-            # Check if line is a comment
-            is_comment = False
-            if ext == '.py':
-                is_comment = stripped.startswith('#')
-            elif ext in ['.js', '.ts', '.java', '.cs', '.c', '.cpp']:
-                is_comment = stripped.startswith('//') or stripped.startswith('/*') or stripped.startswith('*')
             
-            if is_comment:
-                comment_lines += 1
-            else:
-                code_lines += 1
+            # Comment overuse: count comment and code lines, ignoring empty ones
+            if stripped:
+                if is_comment:
+                    comment_lines += 1
+                else:
+                    code_lines += 1
+        
+        smells = [{
+            "type": "duplicate_code",
+            "description": f"Duplicate code block found",
+            "lines": f"{start+1}-{last+block_size}, {first+1}-{first+last-start+block_size}",
+            "severity": "medium"
+        } for start, first, last in duplicate_runs]
+        smells += conditional_smells + dead_code_smells
         
         # Calculate comment to code ratio
         if code_lines > 0:
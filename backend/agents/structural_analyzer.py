@@ -1,26 +1,84 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
+from bisect import bisect_right
+from collections import Counter
 import os
+import re
 import statistics
 
 from models.repository import Repository
 from models.analysis import StructuralAnalysis
 from core.repo_ingestion import extract_language_stats
+from core.executors import map_batches_in_processes
+from core.content_cache import ContentCache, content_digest
+
+# Per-extension tables used by the complexity estimate and the dependency graph,
+# built once at import. Values are tuples so they can go straight to str.startswith.
+_CONTROL_KEYWORDS = ('if', 'for', 'while', 'switch', 'case')
+_CONTROL_KEYWORD_EXTENSIONS = frozenset(('.py', '.js', '.ts'))
+
+_FUNCTION_INDICATORS = {
+    '.py': ('def ', 'async def '),
+    '.js': ('function ', 'const ', '=>'),
+    '.ts': ('function ', 'const ', '=>'),
+    '.java': ('public ', 'private ', 'protected ', 'void ', 'static '),
+    '.c': (') {',),
+    '.cpp': (') {',),
+    '.cs': ('public ', 'private ', 'protected ', 'void ', 'static '),
+}
+_DEFAULT_FUNCTION_INDICATORS = (') {',)
+
+# File size buckets by line count: under 100, under 300, under 500, and the rest
+_SIZE_BUCKET_BOUNDS = (100, 300, 500)
+_SIZE_BUCKET_NAMES = ("small", "medium", "large", "very_large")
+
+# Below this many characters of uncached content (about 80ms of estimation at
+# ~50 MB/s) the complexity estimates run inline rather than in the process pool
+_PARALLEL_ESTIMATE_MIN_CHARS = 4_000_000
+
+# Per-file results keyed by (extension, content digest), so repeat analyses of
+# unchanged files skip the scans: (complexity, line count) for the metrics, and
+# the module names imported by a file for the dependency graph
+_complexity_cache = ContentCache(max_size=4096)
+_import_cache = ContentCache(max_size=4096)
+
+def _import_regex(prefixes: Tuple[str, ...]) -> re.Pattern:
+    """Compile a pattern capturing the second whitespace-separated token of every line that,
+    once stripped, starts with one of prefixes (the imported module name, possibly quoted).
+    Whitespace is matched within the line only, as str.strip/str.split would see it. Lines
+    are found by their leading newline rather than ^, since a literal first character lets
+    the regex engine skip to candidate positions instead of trying every one; the content
+    is scanned with a newline prepended so the first line is found too."""
+    alternatives = [
+        # A prefix ending in a space is the whole first token; otherwise the first
+        # token runs on to the next whitespace (e.g. "require('x')")
+        re.escape(prefix) if prefix.endswith(' ') else re.escape(prefix) + r'\S*[^\S\n]'
+        for prefix in prefixes
+    ]
+    return re.compile(r'\n[^\S\n]*(?:' + '|'.join(alternatives) + r')[^\S\n]*(\S+)')
+
+_IMPORT_PATTERNS = {
+    '.py': _import_regex(('import ', 'from ')),
+    '.js': _import_regex(('import ', 'require(')),
+    '.ts': _import_regex(('import ', 'require(')),
+    '.java': _import_regex(('import ',)),
+    '.cpp': _import_regex(('#include ',)),
+    '.c': _import_regex(('#include ',)),
+}
 
 async def analyze_repository_structure(repository: Repository, files_content: Dict[str, str]) -> StructuralAnalysis:
     """Analyze the structural aspects of a repository"""
     
     # Count files and directories
-    file_count = 0
+    file_count = len(files_content)
     directory_set = set()
     
-    for file_path in files_content.keys():
-        file_count += 1
-        # Add all parent directories to the set
-        path_parts = file_path.split('/')
-        for i in range(len(path_parts)):
-            directory = '/'.join(path_parts[:i])
-            if directory:
-                directory_set.add(directory)
+    for file_path in files_content:
+        # Add all parent directories to the set, slicing the path at each '/'
+        # from the right (a '/' at position 0 would give an empty name)
+        i = file_path.rfind('/')
+        while i > 0:
+            directory_set.add(file_path[:i])
+            i = file_path.rfind('/', 0, i)
     
     directory_count = len(directory_set)
     
@@ -52,35 +110,43 @@ async def calculate_complexity_metrics(files_content: Dict[str, str]) -> Dict[st
         "file_size_distribution": {}
     }
     
-    # Calculate line counts
-    line_counts = [len(content.split('\n')) for content in files_content.values()]
+    # Simple complexity estimation based on code characteristics, which also
+    # yields each file's line count. Serve what we can from the cache and
+    # estimate the rest, in parallel for large inputs.
+    estimates = []
+    pending = []
+    for file_path, content in files_content.items():
+        cache_key = (os.path.splitext(file_path)[1].lower(), content_digest(content))
+        estimate = _complexity_cache.get(cache_key)
+        if estimate is None:
+            pending.append((len(estimates), cache_key, file_path, content))
+        estimates.append(estimate)
+    
+    if pending:
+        estimated = await map_batches_in_processes(
+            _estimate_files,
+            [(file_path, content) for _, _, file_path, content in pending],
+            _PARALLEL_ESTIMATE_MIN_CHARS
+        )
+        for (index, cache_key, _, _), estimate in zip(pending, estimated):
+            _complexity_cache.set(cache_key, estimate)
+            estimates[index] = estimate
+    
+    complexities = [complexity for complexity, _ in estimates]
+    line_counts = [line_count for _, line_count in estimates]
     
     if line_counts:
         metrics["average_lines_per_file"] = round(statistics.mean(line_counts), 1)
         metrics["max_lines"] = max(line_counts)
     
-    # Simple complexity estimation based on code characteristics
-    complexities = []
-    for file_path, content in files_content.items():
-        complexity = await estimate_file_complexity(file_path, content)
-        complexities.append(complexity)
-    
     if complexities:
         metrics["average_complexity"] = round(statistics.mean(complexities), 1)
         metrics["max_complexity"] = max(complexities)
     
-    # File size distribution
-    size_ranges = {"small": 0, "medium": 0, "large": 0, "very_large": 0}
-    for content in files_content.values():
-        lines = len(content.split('\n'))
-        if lines < 100:
-            size_ranges["small"] += 1
-        elif lines < 300:
-            size_ranges["medium"] += 1
-        elif lines < 500:
-            size_ranges["large"] += 1
-        else:
-            size_ranges["very_large"] += 1
+    # File size distribution, bucketing the line counts gathered above
+    size_ranges = dict.fromkeys(_SIZE_BUCKET_NAMES, 0)
+    for bucket, count in Counter(bisect_right(_SIZE_BUCKET_BOUNDS, lines) for lines in line_counts).items():
+        size_ranges[_SIZE_BUCKET_NAMES[bucket]] = count
     
     total_files = len(files_content)
     if total_files > 0:
@@ -90,8 +156,12 @@ async def calculate_complexity_metrics(files_content: Dict[str, str]) -> Dict[st
     
     return metrics
 
-async def estimate_file_complexity(file_path: str, content: str) -> float:
-    """Estimate complexity of a file based on characteristics"""
+def _estimate_files(items: List[Tuple[str, str]]) -> List[Tuple[float, int]]:
+    """Estimate a batch of (file_path, content) pairs; runs in worker processes for large repositories"""
+    return [estimate_file_complexity(file_path, content) for file_path, content in items]
+
+def estimate_file_complexity(file_path: str, content: str) -> Tuple[float, int]:
+    """Estimate complexity of a file based on characteristics, returning (complexity, line count)"""
     lines = content.split('\n')
     extension = os.path.splitext(file_path)[1].lower()
     
@@ -107,16 +177,35 @@ async def estimate_file_complexity(file_path: str, content: str) -> float:
     elif line_count > 100:
         complexity += 1.0
     
-    # Factor 2: Nesting level
-    indentation_levels = []
+    # Control keywords are only counted for some languages
+    control_keywords = _CONTROL_KEYWORDS if extension in _CONTROL_KEYWORD_EXTENSIONS else ()
+    indicators = _FUNCTION_INDICATORS.get(extension, _DEFAULT_FUNCTION_INDICATORS)
+    
+    # Gather nesting levels, control keywords and function indicators in one pass.
+    # Blank lines hold none of them (every indicator has a non-space character).
+    indent_total = 0
+    indent_lines = 0
+    max_indent = 0
+    keyword_count = 0
+    function_count = 0
     for line in lines:
-        if line.strip() and not line.strip().startswith(('#', '//', '/*', '*')):
-            indent = len(line) - len(line.lstrip())
-            indentation_levels.append(indent)
+        stripped = line.lstrip()
+        if not stripped:
+            continue
+        if not stripped.startswith(('#', '//', '/*', '*')):
+            indent = len(line) - len(stripped)
+            indent_total += indent
+            indent_lines += 1
+            if indent > max_indent:
+                max_indent = indent
+        if stripped.startswith(control_keywords):
+            keyword_count += 1
+        if any(indicator in line for indicator in indicators):
+            function_count += 1
     
-    if indentation_levels:
-        avg_indent = sum(indentation_levels) / len(indentation_levels)
-        max_indent = max(indentation_levels) if indentation_levels else 0
+    # Factor 2: Nesting level
+    if indent_lines:
+        avg_indent = indent_total / indent_lines
         
         # More indentation means more complexity
         if max_indent > 20:
@@ -127,40 +216,21 @@ async def estimate_file_complexity(file_path: str, content: str) -> float:
         if avg_indent > 8:
             complexity += 1.0
     
-    # Factor 3: Language-specific complexity indicators
-    if extension in ('.py', '.js', '.ts'):
-        # Count conditional statements and loops
-        control_keywords = ['if', 'for', 'while', 'switch', 'case']
-        keyword_count = sum(line.strip().startswith(kw) for kw in control_keywords for line in lines)
+    # Factor 3: Language-specific complexity indicators (density of conditionals and loops)
+    if control_keywords:
         keyword_density = keyword_count / max(1, line_count)
         
         if keyword_density > 0.1:
             complexity += 1.0
     
     # Factor 4: Function/method count
-    function_indicators = {
-        '.py': ['def ', 'async def '],
-        '.js': ['function ', 'const ', '=>'],
-        '.ts': ['function ', 'const ', '=>'],
-        '.java': ['public ', 'private ', 'protected ', 'void ', 'static '],
-        '.c': [') {', ') {'],
-        '.cpp': [') {', ') {'],
-        '.cs': ['public ', 'private ', 'protected ', 'void ', 'static '],
-    }
-    
-    indicators = function_indicators.get(extension, [') {'])
-    function_count = sum(
-        1 for line in lines 
-        if any(indicator in line for indicator in indicators)
-    )
-    
     if function_count > 20:
         complexity += 2.0
     elif function_count > 10:
         complexity += 1.0
     
     # Cap complexity at 10
-    return min(10.0, complexity)
+    return min(10.0, complexity), line_count
 
 async def build_dependency_graph(files_content: Dict[str, str]) -> Dict[str, List[str]]:
     """Build a basic dependency graph between files"""
@@ -172,34 +242,32 @@ async def build_dependency_graph(files_content: Dict[str, str]) -> Dict[str, Lis
     
     for file_path, content in files_content.items():
         dependencies = []
+        dependency_graph[file_path] = dependencies
         
-        # Look for import statements
-        import_patterns = {
-            '.py': ['import ', 'from '],
-            '.js': ['import ', 'require('],
-            '.ts': ['import ', 'require('],
-            '.java': ['import '],
-            '.cpp': ['#include '],
-            '.c': ['#include '],
-        }
-        
+        # Look for import statements (files in other languages have none to find)
         extension = os.path.splitext(file_path)[1]
-        patterns = import_patterns.get(extension, [])
+        pattern = _IMPORT_PATTERNS.get(extension)
+        if pattern is None:
+            continue
         
-        # Simple heuristic detection of imports
-        for line in content.split('\n'):
-            line = line.strip()
-            for pattern in patterns:
-                if line.startswith(pattern):
-                    # Extract the imported module name
-                    parts = line.split()
-                    if len(parts) > 1:
-                        module_name = parts[1].strip('";\'')
-                        # Check if this import refers to one of our files
-                        base_module = module_name.split('.')[0].split('/')[0]
-                        if base_module in file_basenames and file_basenames[base_module] != file_path:
-                            dependencies.append(file_basenames[base_module])
+        cache_key = (extension, content_digest(content))
+        imported_modules = _import_cache.get(cache_key)
+        if imported_modules is None:
+            imported_modules = _find_imported_modules(content, pattern)
+            _import_cache.set(cache_key, imported_modules)
         
-        dependency_graph[file_path] = dependencies
+        # Check which imports refer to one of our files
+        for base_module in imported_modules:
+            target = file_basenames.get(base_module)
+            if target is not None and target != file_path:
+                dependencies.append(target)
     
-    return dependency_graph
\ No newline at end of file
+    return dependency_graph
+
+def _find_imported_modules(content: str, pattern: re.Pattern) -> Tuple[str, ...]:
+    """Base names of the modules imported by a file, in order of appearance"""
+    # Simple heuristic detection of imports, in one regex scan over the content
+    return tuple(
+        match.group(1).strip('";\'').split('.')[0].split('/')[0]
+        for match in pattern.finditer('\n' + content)
+    )
\ No newline at end of file
@@ -2,21 +2,23 @@ from fastapi import Depends, HTTPException, status
 from typing import Dict, Any, Optional
 import uuid
 
-from services.gitingest_service import GitIngestService
-from services.llm_service import LLMService
+from services.gitingest_service import GitIngestService, git_service
+from services.llm_service import LLMService, llm_service
 from config.settings import settings
 
 # In-memory storage for development
 # In production, this should be replaced with a proper database
 repositories_db: Dict[str, Dict[str, Any]] = {}
 analyses_db: Dict[str, Dict[str, Any]] = {}
-reports_db: Dict[str, Dict[str, Any]] = {}
+# Reports never change once stored, so they are kept as JSON serialized once and served as-is
+reports_db: Dict[str, str] = {}
 
+# The services hold no per-request state, so every request shares one instance
 def get_git_service() -> GitIngestService:
-    return GitIngestService()
+    return git_service
 
 def get_llm_service() -> LLMService:
-    return LLMService()
+    return llm_service
 
 def get_repository(repo_id: str) -> Dict[str, Any]:
     if repo_id not in repositories_db:
@@ -34,7 +36,7 @@ def get_analysis(analysis_id: str) -> Dict[str, Any]:
         )
     return analyses_db[analysis_id]
 
-def get_report(report_id: str) -> Dict[str, Any]:
+def get_report(report_id: str) -> str:
     if report_id not in reports_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
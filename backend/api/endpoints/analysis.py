@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Response, status
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 
@@ -60,7 +60,7 @@ async def process_analysis(
         report_id = generate_id("report-")
         report = await generate_report(analysis_result, repository)
         report.id = report_id
-        reports_db[report_id] = report.dict()
+        reports_db[report_id] = report.model_dump_json()
         
         # Link report ID to analysis
         analyses_db[analysis_id]["report_id"] = report_id
@@ -116,7 +116,7 @@ async def get_analysis_status(analysis_id: str):
     """Get analysis status and results"""
     return get_analysis(analysis_id)
 
-@router.get("/{analysis_id}/report", response_model=Report)
+@router.get("/{analysis_id}/report", responses={200: {"model": Report}})
 async def get_analysis_report(analysis_id: str):
     """Get the report for an analysis"""
     analysis = get_analysis(analysis_id)
@@ -134,4 +134,6 @@ async def get_analysis_report(analysis_id: str):
             detail=f"No report found for analysis {analysis_id}"
         )
     
-    return get_report(report_id)
\ No newline at end of file
+    # The stored JSON is returned verbatim instead of being re-validated; the
+    # Report model above only documents the response schema
+    return Response(content=get_report(report_id), media_type="application/json")
\ No newline at end of file
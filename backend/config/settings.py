@@ -13,11 +13,16 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4")
+    MAX_LLM_CONCURRENCY: int = 8  # Concurrent LLM requests per batch
+    REFACTORING_CACHE_DIR: str = os.getenv("REFACTORING_CACHE_DIR", os.path.expanduser("~/.cache/refactoring_advisor"))  # Empty to disable
+    REFACTORING_CACHE_TTL_SEC: int = 7 * 24 * 3600  # 1 week
+    REFACTORING_CACHE_MAX_ENTRIES: int = 10000
     
     # Analysis settings
     MAX_FILES_TO_ANALYZE: int = 100
     MAX_FILE_SIZE_KB: int = 500
     ANALYSIS_TIMEOUT_SEC: int = 600  # 10 minutes
+    MAX_ANALYSIS_WORKERS: int = os.cpu_count() or 1  # Process pool size for CPU-bound scans
     
     class Config:
         env_file = ".env"
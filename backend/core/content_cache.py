@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+def content_digest(content: str) -> bytes:
+    """Return a short BLAKE2b digest of file content for use in cache keys"""
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+class ContentCache:
+    """Bounded LRU cache for results derived from file content"""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if it is not cached"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class DiskCache:
+    """Persistent text cache with one file per key, bounded by age and entry count"""
+    
+    # How many writes happen between prunes of the cache directory
+    PRUNE_INTERVAL = 64
+    
+    def __init__(self, directory: str, ttl_sec: int, max_entries: int = 10000):
+        self.directory = directory
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._writes = 0
+    
+    def _path(self, key: bytes) -> str:
+        return os.path.join(self.directory, key.hex() + '.txt')
+    
+    def get(self, key: bytes) -> Optional[str]:
+        """Return the cached text for key, or None if it is missing, expired or unreadable"""
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_sec:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, UnicodeError):
+            return None
+    
+    def set(self, key: bytes, value: str) -> None:
+        """Store text atomically; failures are ignored since the cache is only an optimization"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            return
+        replaced = False
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+            replaced = True
+        except (OSError, UnicodeError):
+            return
+        finally:
+            # Never leave a temporary file behind, whatever went wrong
+            if not replaced:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+        
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self._prune()
+    
+    def _entries(self) -> List[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith('.txt')]
+        except OSError:
+            return []
+    
+    def _prune(self) -> None:
+        """Delete the oldest entries beyond max_entries"""
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        
+        # Entries removed concurrently (by clear() or another process) are skipped
+        aged = []
+        for entry in entries:
+            try:
+                aged.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass
+        aged.sort()
+        for _, path in aged[:len(aged) - self.max_entries]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+    
+    def clear(self) -> None:
+        """Invalidate the whole cache"""
+        for entry in self._entries():
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
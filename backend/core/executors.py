@@ -0,0 +1,65 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from config.settings import settings
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool used for CPU-bound analysis work"""
+    global _process_pool
+    if _process_pool is None:
+        # Forking a server process that already runs threads can deadlock the children,
+        # so workers are started fresh
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.MAX_ANALYSIS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Return the shared thread pool used to keep blocking work off the event loop"""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=settings.MAX_ANALYSIS_WORKERS, thread_name_prefix="analysis")
+    return _thread_pool
+
+async def run_in_thread(func: Callable[..., Any], *args: Any) -> Any:
+    """Run func(*args) in the shared thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), func, *args)
+
+async def map_batches_in_processes(
+    func: Callable[[List[Tuple[str, str]]], List[Any]],
+    items: Sequence[Tuple[str, str]],
+    min_chars: int
+) -> List[Any]:
+    """Run func (a module-level function mapping a list of (name, content) items to a list of results) over batches of items in the process pool, preserving order"""
+    workers = settings.MAX_ANALYSIS_WORKERS
+    
+    # Small inputs are not worth the cost of pickling them to another process
+    if workers < 2 or sum(len(content) for _, content in items) < min_chars:
+        return func(list(items))
+    
+    batch_size = -(-len(items) // workers)
+    batches = [list(items[i:i + batch_size]) for i in range(0, len(items), batch_size)]
+    
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    batch_results = await asyncio.gather(*[
+        loop.run_in_executor(pool, func, batch) for batch in batches
+    ])
+    return [result for batch_result in batch_results for result in batch_result]
+
+def shutdown_executors() -> None:
+    """Shut down the shared pools (called on application shutdown)"""
+    global _process_pool, _thread_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
@@ -1,4 +1,5 @@
 import os
+from collections import defaultdict
 from typing import Dict, List, Optional, Set
 
 from models.repository import Repository, FileInfo
@@ -55,13 +56,13 @@ async def extract_language_stats(repository: Repository) -> Dict[str, float]:
         return {}
     
     # Count files by extension
-    extension_counts = {}
+    extension_counts = defaultdict(int)
     
     def count_extensions(directory):
         for file_info in directory.files:
             ext = os.path.splitext(file_info.path)[1].lower()
             if ext:
-                extension_counts[ext] = extension_counts.get(ext, 0) + 1
+                extension_counts[ext] += 1
         
         for subdir in directory.subdirectories:
             count_extensions(subdir)
@@ -99,10 +100,10 @@ async def extract_language_stats(repository: Repository) -> Dict[str, float]:
     }
     
     # Aggregate by language
-    language_counts = {}
+    language_counts = defaultdict(int)
     for ext, count in extension_counts.items():
         language = extension_to_language.get(ext, 'Other')
-        language_counts[language] = language_counts.get(language, 0) + count
+        language_counts[language] += count
     
     # Convert to percentages
     total_files = sum(language_counts.values())
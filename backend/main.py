@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.endpoints import repositories, analysis
+from core.executors import shutdown_executors
 
 app = FastAPI(
     title="Code Analysis API",
@@ -21,6 +22,11 @@ app.add_middleware(
 app.include_router(repositories.router, prefix="/api/repositories", tags=["repositories"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["analysis"])
 
+@app.on_event("shutdown")
+def shutdown():
+    """Release worker pools used by the analysis agents"""
+    shutdown_executors()
+
 @app.get("/", tags=["health"])
 async def health_check():
     """Health check endpoint"""
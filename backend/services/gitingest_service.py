@@ -98,4 +98,7 @@ class GitIngestService:
                 return True
             except Exception:
                 return False
-        return False
\ No newline at end of file
+        return False
+
+# Create an instance to be imported by other modules
+git_service = GitIngestService()
@@ -1,6 +1,7 @@
 import os
 import json
-from typing import List, Dict, Any, Optional
+import asyncio
+from typing import List, Dict, Any, Optional, Union
 import openai
 from config.settings import settings
 
@@ -10,6 +11,31 @@ class LLMService:
         self.model = model
         openai.api_key = api_key
     
+    async def _call_llm(self, prompt: str, max_tokens: int = 2000) -> str:
+        """Send a single prompt to the LLM and return the raw response text"""
+        response = await openai.ChatCompletion.acreate(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are a code analysis assistant with expertise in software design, architecture, and best practices."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=0.2
+        )
+        return response.choices[0].message.content
+    
+    async def batch_call(self, prompts: List[str], max_concurrency: int = settings.MAX_LLM_CONCURRENCY) -> List[Union[str, Exception]]:
+        """Run several prompts, returning each response (or the exception it raised) in order"""
+        # The OpenAI client in use has no batch endpoint, so the prompts are sent
+        # as concurrent requests bounded by a semaphore
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def call(prompt: str) -> str:
+            async with semaphore:
+                return await self._call_llm(prompt)
+        
+        return await asyncio.gather(*[call(prompt) for prompt in prompts], return_exceptions=True)
+    
     async def analyze_code(self, code: str, context: str, max_tokens: int = 1000) -> str:
         """Analyze code with the LLM and return insights"""
         prompt = f"""
@@ -184,4 +210,7 @@ class LLMService:
                 return []
         except Exception as e:
             print(f"Error in refactoring suggestion: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+
+# Create an instance to be imported by other modules
+llm_service = LLMService()